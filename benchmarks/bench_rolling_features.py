@@ -0,0 +1,98 @@
+# ============================================================
+# Benchmark: features rolling por filas vs por tiempo
+# ============================================================
+# Uso:
+#   python benchmarks/bench_rolling_features.py [--days 730] [--repeat 3]
+#
+# Compara la versión anterior de add_rolling_features (ventana de
+# window_days * 24 filas) con rolling_window_stats (ventana "7D" de tiempo
+# real) en datos horarios continuos, horarios con filas filtradas por
+# operación y con muestreo de 10 minutos. Además del tiempo, reporta cuántos
+# días cubre realmente la ventana "de 7 días" por filas.
+# ============================================================
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import hours_since_start, rolling_quantile, rolling_slope, rolling_window_stats  # noqa: E402
+
+TS = "Timestamp"
+
+
+def rolling_features_rows(df: pd.DataFrame, window_days: int = 7) -> pd.DataFrame:
+    """Versión anterior: ventana de ``window_days * 24`` filas."""
+    n = max(24, window_days * 24)
+    min_p = max(12, n // 4)
+    out = pd.DataFrame(index=df.index)
+    out["T_out_ma"] = df["T_a_out"].rolling(n, min_periods=min_p).mean()
+    out["Rf_ma"] = df["Rf_x1e4"].rolling(n, min_periods=min_p).mean()
+    out["U_ma"] = df["U_Wm2K"].rolling(n, min_periods=min_p).mean()
+    out["T_out_p95_7d"] = rolling_quantile(df["T_a_out"].to_numpy(dtype=float), n, 0.95, min_p)
+    out["Rf_slope"] = rolling_slope(df["Rf_x1e4"].to_numpy(dtype=float), hours_since_start(df[TS]), n, min_p)
+    return out
+
+
+def make_frame(days: int, freq: str, keep: float, seed: int = 11) -> pd.DataFrame:
+    """Historian sintético; ``keep`` < 1 elimina filas como el filtro de operación."""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range("2023-01-01", periods=int(pd.Timedelta(days=days) / pd.Timedelta(freq)), freq=freq)
+    n = len(ts)
+    df = pd.DataFrame({
+        TS: ts,
+        "T_a_out": 60 + rng.normal(0, 1, n),
+        "Rf_x1e4": np.cumsum(rng.normal(0.001, 0.01, n)),
+        "U_Wm2K": rng.normal(500, 10, n),
+    })
+    if keep < 1:
+        # Paradas en bloques de horas/días, no filas sueltas
+        block = rng.random(n // 24 + 1) < keep
+        df = df[np.repeat(block, 24)[:n]].reset_index(drop=True)
+    return df
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de ventanas rolling por filas vs por tiempo.")
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    scenarios = [
+        ("horaria continua", "1h", 1.0),
+        ("horaria, 40% parada", "1h", 0.6),
+        ("10 minutos", "10min", 1.0),
+    ]
+    
+    print(f"{'escenario':<22} {'filas':>9} {'filas(s)':>9} {'tiempo(s)':>10} {'span filas (d)':>15} {'span tiempo (d)':>16}")
+    for label, freq, keep in scenarios:
+        df = make_frame(args.days, freq, keep)
+        t_rows = best_of(lambda: rolling_features_rows(df), args.repeat)
+        t_time = best_of(lambda: rolling_window_stats(df, TS, "7D"), args.repeat)
+        
+        # Tiempo real cubierto por cada ventana (mediana en régimen)
+        ts = df[TS]
+        span_rows = (ts - ts.shift(7 * 24 - 1)).dt.total_seconds().median() / 86400
+        starts = np.searchsorted(ts.to_numpy(), (ts - pd.Timedelta("7D")).to_numpy(), side="right")
+        span_time = ((ts.to_numpy() - ts.to_numpy()[starts]) / np.timedelta64(1, "D"))[len(ts) // 2:].max()
+        print(f"{label:<22} {len(df):>9,} {t_rows:>9.3f} {t_time:>10.3f} {span_rows:>15.2f} {span_time:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# ============================================================
+# Benchmark: tiempo y memoria por etapa del pipeline
+# ============================================================
+# Uso:
+#   python benchmarks/bench_stages.py                              # 2 años horarios sintéticos
+#   python benchmarks/bench_stages.py --years 2 --freq 1min --json resultados/stages_1min.json
+#   python benchmarks/bench_stages.py --data historian.csv --washes lavados.csv --skip train_models
+#
+# Genera un historian con synthetic_historian (o usa --data) y mide cada
+# etapa del dashboard por separado: read_csv_auto, to_numeric (limpieza
+# del historian completo), explode_wide_to_long, apply_thermal_model,
+# add_rolling_features, build_event_label, train_models y generate_pdf.
+# Cada etapa corre --repeat veces sin trazar (se reporta la mejor) y una vez
+# más bajo tracemalloc para la memoria pico (asignaciones Python/numpy; los
+# buffers de pyarrow y los procesos hijos no se cuentan). Los resultados
+# quedan en un JSON para comparar entre versiones y tamaños.
+# ============================================================
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from engine import (  # noqa: E402
+    AppConfig,
+    ROLLING_WINDOW_DAYS,
+    add_rolling_features,
+    add_wash_features,
+    apply_thermal_model,
+    build_cooler_frames,
+    build_event_label,
+    build_pyramids,
+    calculate_criticidad,
+    clean_historian,
+    compute_global_window,
+    explode_wide_to_long,
+    filter_operation,
+    generate_pdf,
+    get_ml_features,
+    load_washes,
+    prep_ml_data,
+    process_coolers,
+    read_csv_auto,
+    train_models,
+)
+from ml_cv import measure  # noqa: E402
+from perf import count_rows  # noqa: E402
+from synthetic_historian import generate_historian  # noqa: E402
+
+STAGES = ["read_csv_auto", "to_numeric", "explode_wide_to_long", "apply_thermal_model",
+          "add_rolling_features", "build_event_label", "train_models", "generate_pdf"]
+COOLERS = ["TS", "TAI", "TAF"]
+
+
+def run_stage(name: str, fn: Callable[[], Any], rows_in: Optional[int], repeat: int,
+              memory: bool) -> Tuple[Dict[str, Any], Any]:
+    """Mejor tiempo de ``repeat`` corridas y, si ``memory``, pico de tracemalloc en una corrida extra."""
+    times = []
+    for _ in range(max(repeat, 1)):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    row = {"stage": name, "seconds": min(times), "seconds_median": float(np.median(times)),
+           "rows_in": rows_in, "rows_out": count_rows(result), "peak_mb": None}
+    if isinstance(result, bytes):
+        row["bytes_out"] = len(result)
+    if memory:
+        # Los folds que train_models mide por su cuenta comparten perf.MEMORY:
+        # su pico se acumula en esta medición.
+        _, _, row["peak_mb"] = measure(fn)
+    mem = f"{row['peak_mb']:9.1f} MB" if row["peak_mb"] is not None else " " * 12
+    rows = [f"{r:,}" if r is not None else "-" for r in (rows_in, row["rows_out"])]
+    print(f"  {name:22s} {row['seconds']:8.3f} s {mem}  filas {rows[0]:>10} → {rows[1]:>10}", flush=True)
+    return row, result
+
+
+def main() -> None:
+    warnings.filterwarnings("ignore")
+    cfg = AppConfig()
+    parser = argparse.ArgumentParser(description="Benchmark de tiempo y memoria por etapa del pipeline.")
+    parser.add_argument("--data", default=None, help="Historian existente (por defecto, uno sintético)")
+    parser.add_argument("--washes", default=None, help="Lavados del historian entregado en --data")
+    parser.add_argument("--years", type=float, default=2.0, help="Años de historia sintética")
+    parser.add_argument("--freq", default="h", help="Muestreo sintético (h, 10min, 1min, ...)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=1, help="Corridas sin trazar por etapa")
+    parser.add_argument("--no-memory", action="store_true", help="Omitir la corrida con tracemalloc")
+    parser.add_argument("--skip", nargs="*", default=[], choices=STAGES, help="Etapas a omitir")
+    parser.add_argument("--ml-cooler", default="TS", choices=COOLERS)
+    parser.add_argument("--ml-rows", type=int, default=50_000, help="Máximo de filas (las últimas) para train_models")
+    parser.add_argument("--pdf-workers", type=int, default=1, help="Procesos para las figuras del PDF")
+    parser.add_argument("--json", default="bench_stages.json", help="Archivo de resultados")
+    args = parser.parse_args()
+    memory = not args.no_memory
+
+    with tempfile.TemporaryDirectory(prefix="cap3_bench_") as tmp:
+        meta: Dict[str, Any] = {"years": None, "freq": None, "seed": None}
+        if args.data:
+            data_file, wash_file = args.data, args.washes or cfg.WASH_FILE
+        else:
+            data_file, wash_file = os.path.join(tmp, "historian.csv"), os.path.join(tmp, "washes.csv")
+            t0 = time.perf_counter()
+            info = generate_historian(data_file, args.years, args.freq, args.seed, washes_path=wash_file)
+            meta.update(years=args.years, freq=args.freq, seed=args.seed)
+            print(f"Historian sintético: {info['rows']:,} filas, {info['bytes'] / 1e6:.1f} MB "
+                  f"({time.perf_counter() - t0:.1f} s)")
+        meta.update(file_mb=os.path.getsize(data_file) / 1e6)
+        washes = load_washes(wash_file)
+
+        stages: List[Dict[str, Any]] = []
+
+        def stage(name: str, fn: Callable[[], Any], rows_in: Optional[int]) -> Any:
+            if name in args.skip:
+                # Las etapas omitidas que alimentan a otras corren igual, sin medir
+                return fn() if name not in ("train_models", "generate_pdf") else None
+            row, result = run_stage(name, fn, rows_in, args.repeat, memory)
+            stages.append(row)
+            return result
+
+        print(f"{'Etapa':24s} {'tiempo':>10s} {'memoria':>12s}")
+        df_raw = stage("read_csv_auto", lambda: read_csv_auto(data_file), None)
+        meta.update(rows=len(df_raw), columns=df_raw.shape[1])
+        df_wide, ts_col = stage("to_numeric", lambda: clean_historian(df_raw), len(df_raw))
+        stage("explode_wide_to_long", lambda: explode_wide_to_long(df_wide, ts_col), len(df_wide))
+
+        # Filtro de operación fuera de la medición: apply_thermal_model recibe lo mismo que en el pipeline
+        frames = build_cooler_frames(df_wide, ts_col)
+        filtered = {k: filter_operation(frames[k], k) for k in COOLERS}
+        thermal = stage("apply_thermal_model",
+                        lambda: {k: apply_thermal_model(filtered[k], ts_col, k) for k in COOLERS},
+                        sum(len(v) for v in filtered.values()))
+
+        ops = {}
+        for k in COOLERS:
+            df = calculate_criticidad(add_wash_features(thermal[k], washes, ts_col, k), k)
+            ops[k] = df[df["en_operacion"] == 1].copy().sort_values(ts_col)
+        rolled = stage("add_rolling_features",
+                       lambda: {k: add_rolling_features(ops[k], ts_col, ROLLING_WINDOW_DAYS, k) for k in COOLERS},
+                       sum(len(v) for v in ops.values()))
+
+        horizons = [cfg.PRED_HORIZON_DAYS] + [h for h in cfg.LABEL_HORIZONS_DAYS if h != cfg.PRED_HORIZON_DAYS]
+        wash_by = {k: washes[washes["enfriador_key"] == k] for k in COOLERS}
+        labeled = stage("build_event_label",
+                        lambda: {k: build_event_label(rolled[k], wash_by[k], ts_col, horizons) for k in COOLERS},
+                        sum(len(v) for v in rolled.values()))
+
+        k = args.ml_cooler
+        X, y = prep_ml_data(labeled[k], get_ml_features(labeled[k]))
+        X, y = X.tail(args.ml_rows), y.tail(args.ml_rows)
+        ts_ml = labeled[k].loc[X.index, ts_col]
+        stage("train_models", lambda: train_models(X, y, "AUTO", ts_ml, wash_by[k]["wash_ts"], cfg.PRED_HORIZON_DAYS),
+              len(X))
+
+        if "generate_pdf" not in args.skip:
+            all_df, all_op, _ = process_coolers(df_wide, washes, ts_col)
+            pyramids = build_pyramids(all_op, ts_col)
+            window = compute_global_window(all_df, ts_col, cfg.FALLBACK_WINDOW_DAYS)
+            stage("generate_pdf", lambda: generate_pdf(all_df, washes, ts_col, window, "AUTO", "", pyramids, "",
+                                                       fig_dir=None, max_workers=args.pdf_workers),
+                  sum(len(v) for v in all_df.values()))
+
+    meta.update(
+        timestamp=pd.Timestamp.now().isoformat(timespec="seconds"), data=args.data or "sintético",
+        repeat=args.repeat, memory=memory, ml_cooler=args.ml_cooler, ml_rows=args.ml_rows,
+        python=platform.python_version(), pandas=pd.__version__, numpy=np.__version__,
+        platform=platform.platform(), cpu_count=os.cpu_count(),
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "stages": stages}, f, indent=2, ensure_ascii=False)
+    print(f"\nTotal {sum(s['seconds'] for s in stages):.2f} s → {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# ============================================================
+# Benchmark: tiempo de arranque en frío
+# ============================================================
+# Uso:
+#   python benchmarks/bench_startup.py --repeat 5
+#
+# Mide, en procesos nuevos (sin caché de módulos), cuánto tarda importar
+# el motor (engine), el dashboard (app, con Streamlit y Plotly) y el costo
+# diferido de las dependencias pesadas (sklearn, reportlab, matplotlib)
+# que solo se pagan al entrenar o generar el PDF. Verifica además que
+# importar engine no cargue Streamlit ni las dependencias pesadas.
+# ============================================================
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["streamlit", "plotly", "sklearn", "reportlab", "matplotlib", "joblib"]
+
+CASES = {
+    "python (base)": "pass",
+    "import engine": "import engine",
+    "import app": "import app",
+    "engine + sklearn (entrenar)": "import engine, ml_cv; ml_cv.make_candidate('LogisticRegression')",
+    "engine + reportlab + matplotlib (PDF)": ("import engine, pdf_figures, reportlab.platypus; "
+                                              "pdf_figures._pyplot()"),
+    "carga ansiosa anterior": ("import engine, streamlit, plotly.graph_objects, sklearn.ensemble, "
+                               "sklearn.linear_model, sklearn.metrics, joblib, reportlab.platypus, "
+                               "matplotlib.pyplot"),
+}
+
+
+def cold_time(code: str) -> float:
+    """Segundos de un proceso nuevo que ejecuta ``code`` (medido dentro del proceso)."""
+    script = ("import time; t0 = time.perf_counter()\n"
+              f"{code}\n"
+              "print(time.perf_counter() - t0)")
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def loaded_heavy(module: str) -> list:
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío del motor y del dashboard.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'Caso':40s} {'mediana':>9s} {'mín':>9s}")
+    for name, code in CASES.items():
+        times = [cold_time(code) for _ in range(args.repeat)]
+        print(f"{name:40s} {np.median(times):8.3f}s {min(times):8.3f}s")
+
+    heavy = loaded_heavy("engine")
+    print(f"\nMódulos pesados tras 'import engine': {', '.join(heavy) if heavy else 'ninguno'}")
+    if heavy:
+        raise SystemExit("engine no debe importar dependencias pesadas al arrancar")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# ============================================================
+# Generador de historian sintético - Enfriadores CAP-3
+# ============================================================
+# Uso:
+#   python benchmarks/synthetic_historian.py                       # 2 años horarios
+#   python benchmarks/synthetic_historian.py --years 5 --freq 1min --out /tmp/cap3_5y_1min.csv
+#
+# Escribe un CSV ancho con el formato del historian de planta (separador
+# ";", timestamp "dd-mm-aaaa HH:MM", cp1252) con todos los tags de
+# ENGINEERING_MAP más el soplador, y el archivo de lavados asociado.
+#
+# Física: cada enfriador es un intercambiador en contracorriente
+# (efectividad-NTU) con U = 1 / (1/U_limpio + Rf). Rf crece entre lavados
+# (rampa por ciclo con curvatura aleatoria) y vuelve a un valor bajo tras
+# cada lavado; TI25279 es la mezcla de las salidas de agua ponderada por
+# flujo (como en planta, el Rf aparente que calcula el dashboard con ese
+# tag común refleja también el estado de los otros equipos). Se agregan
+# ciclos diarios/estacionales del agua de enfriamiento, variaciones de
+# carga, paradas de planta (soplador bajo), el día fuera de servicio de
+# cada lavado y tokens inválidos ("Bad Input", "Error", ...).
+#
+# Es determinista: la misma semilla y los mismos parámetros producen el
+# mismo archivo. Se escribe por bloques, así que el tamaño no está limitado
+# por la memoria.
+# ============================================================
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import (  # noqa: E402
+    BLOWER_TAG,
+    DESIGN_PARAMS,
+    ENGINEERING_MAP,
+    WASH_KEY_TO_NAME,
+    acid_properties_array,
+    historian_tags,
+)
+
+CHUNK_ROWS = 200_000
+BAD_TOKENS = ("Bad Input", "Error", "-", "", "I/O Timeout")
+DAY = pd.Timedelta(days=1)
+
+# Rangos de los ciclos de ensuciamiento (múltiplos de fouling_design_m2KW)
+WASH_INTERVAL_DAYS = (70.0, 140.0)
+RF_AFTER_WASH = (0.3, 0.8)
+RF_BEFORE_WASH = (3.0, 6.0)
+WASH_OUTAGE_HOURS = 24
+STOPS_PER_YEAR = 4
+STOP_HOURS = (12.0, 72.0)
+
+
+# ===========================================
+# PROGRAMA DE LAVADOS Y PARADAS
+# ===========================================
+def wash_schedule(start: pd.Timestamp, end: pd.Timestamp, enf_key: str, seed: int) -> Dict[str, np.ndarray]:
+    """
+    Lavados de un enfriador y parámetros de cada ciclo de ensuciamiento.
+
+    Retorna ``t0`` (inicio de cada ciclo, ns), ``rf0``/``rf1`` (Rf al inicio
+    y al final del ciclo) y ``shape`` (curvatura de la rampa). El primer
+    ciclo empieza antes de ``start`` para que la serie no arranque limpia.
+    """
+    rng = np.random.default_rng([seed, 1, list(DESIGN_PARAMS).index(enf_key)])
+    rf_design = DESIGN_PARAMS[enf_key]["fouling_design_m2KW"]
+    t = start - rng.uniform(0.2, 0.8) * rng.uniform(*WASH_INTERVAL_DAYS) * DAY
+    bounds = [t]
+    while t < end:
+        t += rng.uniform(*WASH_INTERVAL_DAYS) * DAY
+        bounds.append(t)
+    # El último ciclo termina después del fin de la serie (lavado no registrado)
+    bounds = pd.DatetimeIndex(bounds).floor("h").as_unit("ns").asi8
+    n = len(bounds) - 1
+    return {
+        "t0": bounds[:-1], "t1": bounds[1:],
+        "rf0": rng.uniform(*RF_AFTER_WASH, n) * rf_design,
+        "rf1": rng.uniform(*RF_BEFORE_WASH, n) * rf_design,
+        "shape": rng.uniform(0.8, 1.4, n),
+    }
+
+
+def plant_stops(start: pd.Timestamp, end: pd.Timestamp, seed: int) -> np.ndarray:
+    """Paradas de planta como pares ``[inicio, fin]`` en ns."""
+    rng = np.random.default_rng([seed, 2])
+    years = (end - start) / (365.25 * DAY)
+    n = max(int(round(years * STOPS_PER_YEAR)), 0)
+    begin = start.value + rng.uniform(0, 1, n) * (end.value - start.value)
+    length = rng.uniform(*STOP_HOURS, n) * 3600e9
+    order = np.argsort(begin)
+    return np.column_stack([begin[order], begin[order] + length[order]]).astype(np.int64)
+
+
+def _in_intervals(t: np.ndarray, intervals: np.ndarray) -> np.ndarray:
+    if not len(intervals):
+        return np.zeros(len(t), dtype=bool)
+    i = np.searchsorted(intervals[:, 0], t, side="right") - 1
+    ok = i >= 0
+    inside = np.zeros(len(t), dtype=bool)
+    inside[ok] = t[ok] <= intervals[i[ok], 1]
+    return inside
+
+
+def _smooth_noise(t_days: np.ndarray, seed: int, stream: int, periods=(0.7, 1.9, 4.3, 9.1, 21.0)) -> np.ndarray:
+    """Ruido suave y sin estado (suma de senoidales con fase aleatoria), amplitud ~1."""
+    rng = np.random.default_rng([seed, 3, stream])
+    phases = rng.uniform(0, 2 * np.pi, len(periods))
+    out = np.zeros(len(t_days))
+    for p, ph in zip(periods, phases):
+        out += np.sin(2 * np.pi * t_days / p + ph)
+    return out / np.sqrt(len(periods) / 2)
+
+
+# ===========================================
+# MODELO DEL INTERCAMBIADOR
+# ===========================================
+def counterflow(UA: np.ndarray, C_a: np.ndarray, C_w: np.ndarray, T_a_in: np.ndarray,
+                T_w_in: np.ndarray) -> np.ndarray:
+    """Calor transferido (W) en contracorriente por efectividad-NTU."""
+    C_min = np.minimum(C_a, C_w)
+    C_max = np.maximum(C_a, C_w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Cr = np.where(C_max > 0, C_min / C_max, 0.0)
+        ntu = np.where(C_min > 0, UA / C_min, 0.0)
+        e = np.exp(-ntu * (1 - Cr))
+        eff = np.where(np.isclose(Cr, 1.0), ntu / (1 + ntu), (1 - e) / (1 - Cr * e))
+    return np.nan_to_num(eff) * C_min * np.maximum(T_a_in - T_w_in, 0.0)
+
+
+def fouling(t: np.ndarray, sched: Dict[str, np.ndarray]) -> np.ndarray:
+    """Rf (m²K/W) de cada instante según el ciclo de lavado vigente."""
+    k = np.clip(np.searchsorted(sched["t0"], t, side="right") - 1, 0, len(sched["t0"]) - 1)
+    frac = np.clip((t - sched["t0"][k]) / (sched["t1"][k] - sched["t0"][k]), 0.0, 1.0)
+    return sched["rf0"][k] + (sched["rf1"][k] - sched["rf0"][k]) * frac ** sched["shape"][k]
+
+
+def simulate_chunk(ts: pd.DatetimeIndex, schedules: Dict[str, Dict[str, np.ndarray]], stops: np.ndarray,
+                   seed: int, chunk: int) -> Dict[str, np.ndarray]:
+    """Valores físicos (sin ruido de tokens) de un bloque de timestamps."""
+    rng = np.random.default_rng([seed, 4, chunk])
+    n = len(ts)
+    t = ts.as_unit("ns").asi8
+    t_days = (t - pd.Timestamp("2000-01-01").value) / 86400e9
+    hour = (t_days % 1.0) * 24
+    doy = ts.dayofyear.to_numpy()
+
+    # Agua de enfriamiento: estacional (verano austral en enero) + diario
+    T_w_in = (30.0 + 2.5 * np.cos(2 * np.pi * (doy - 20) / 365.25)
+              + 1.2 * np.sin(2 * np.pi * (hour - 9) / 24) + 0.4 * _smooth_noise(t_days, seed, 0))
+    load = np.clip(0.95 + 0.03 * _smooth_noise(t_days, seed, 1) + 0.015 * np.sin(2 * np.pi * t_days / 7), 0.8, 1.05)
+    stopped = _in_intervals(t, stops)
+    blower = np.where(stopped, rng.uniform(0, 15, n), 60 + 25 * load + rng.normal(0, 1.5, n))
+
+    cols: Dict[str, np.ndarray] = {}
+    heat_w = np.zeros(n)
+    cap_w = np.zeros(n)
+    for i, (enf_key, tags) in enumerate(ENGINEERING_MAP.items()):
+        dsg = DESIGN_PARAMS[enf_key]
+        sched = schedules[enf_key]
+        rf = fouling(t, sched)
+        rf_frac = rf / (RF_BEFORE_WASH[1] * dsg["fouling_design_m2KW"])
+
+        # Día fuera de servicio tras cada lavado
+        washes = sched["t0"][1:]
+        outage = _in_intervals(t, np.column_stack([washes, washes + WASH_OUTAGE_HOURS * 3600 * 10**9]))
+
+        conc = dsg["acid_conc_design"] + 0.25 * _smooth_noise(t_days, seed, 10 + i)
+        cp_a, rho_a = acid_properties_array(conc)
+        m_a = dsg["acid_flow_design_m3h"] * load * np.where(stopped, 0.05, 1.0) * rho_a / 3600
+        F_w = dsg["water_flow_design_m3h"] * (0.97 + 0.02 * _smooth_noise(t_days, seed, 20 + i))
+        F_w = np.where(outage, rng.uniform(0, 5, n), np.where(stopped, F_w * 0.15, F_w))
+        T_a_in = dsg["T_acid_in_design"] + 6 * (load - 0.95) + 0.8 * _smooth_noise(t_days, seed, 30 + i)
+        T_a_in = np.where(stopped, T_w_in + 10, T_a_in)
+
+        C_a = m_a * cp_a
+        C_w = F_w / 3.6 * 4186.0
+        UA = dsg["area_m2"] / (1.0 / dsg["U_clean_Wm2K"] + rf)
+        Q = counterflow(UA, C_a, C_w, T_a_in, T_w_in)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            T_a_out = T_a_in - np.where(C_a > 0, Q / C_a, 0.0)
+        heat_w += Q
+        cap_w += C_w
+
+        cols[tags["F_w"]] = F_w + rng.normal(0, 0.005 * dsg["water_flow_design_m3h"], n)
+        cols[tags["T_a_in"]] = T_a_in + rng.normal(0, 0.3, n)
+        cols[tags["T_a_out"]] = T_a_out + rng.normal(0, 0.3, n)
+        cols[tags["acid_conc"]] = conc + rng.normal(0, 0.05, n)
+        # El operador abre menos el bypass a medida que el equipo se ensucia
+        cols[tags["bypass"]] = np.clip(30 - 20 * rf_frac + rng.normal(0, 1.0, n), 0, 100)
+        cols[tags["pump_amp"]] = np.where(stopped, rng.uniform(0, 3, n), 95 * load + rng.normal(0, 1.5, n))
+        cols[tags["cond_w"]] = 1500 + 60 * _smooth_noise(t_days, seed, 40 + i, (15.0, 45.0)) + rng.normal(0, 15, n)
+
+    T_w_out = T_w_in + np.where(cap_w > 0, heat_w / np.maximum(cap_w, 1e-9), 0.0)
+    cols["TI25138"] = T_w_in + rng.normal(0, 0.2, n)
+    cols["TI25279"] = T_w_out + rng.normal(0, 0.2, n)
+    cols[BLOWER_TAG] = np.clip(blower, 0, 100)
+    return cols
+
+
+# ===========================================
+# ESCRITURA
+# ===========================================
+def _format_chunk(ts: pd.DatetimeIndex, cols: Dict[str, np.ndarray], ts_format: str, bad_rate: float,
+                  seed: int, chunk: int) -> pd.DataFrame:
+    """Texto del bloque: 3 decimales y tokens inválidos en celdas al azar."""
+    rng = np.random.default_rng([seed, 5, chunk])
+    out = {"Timestamp": ts.strftime(ts_format)}
+    for tag in historian_tags():
+        text = np.char.mod("%.3f", cols[tag]).astype(object)
+        if bad_rate > 0:
+            bad = np.flatnonzero(rng.random(len(text)) < bad_rate)
+            text[bad] = rng.choice(np.array(BAD_TOKENS, dtype=object), len(bad))
+        out[tag] = text
+    return pd.DataFrame(out)
+
+
+def generate_historian(path: str, years: float = 2.0, freq: str = "h", seed: int = 42,
+                       start: str = "2023-01-01", bad_rate: float = 0.002,
+                       washes_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Escribe el historian sintético en ``path`` (y los lavados en ``washes_path``).
+
+    El tamaño es ``years`` × frecuencia de muestreo ``freq`` (alias de pandas:
+    "h", "10min", "1min", ...). ``bad_rate`` es la fracción de celdas que se
+    reemplazan por tokens inválidos. Retorna un resumen con filas, rango y
+    número de lavados.
+    """
+    t_start = pd.Timestamp(start)
+    step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    rows = int(years * 365.25 * DAY / step)
+    if rows <= 0:
+        raise ValueError(f"Tamaño vacío: years={years}, freq={freq}")
+    t_end = t_start + (rows - 1) * step
+    ts_format = "%d-%m-%Y %H:%M" if step % pd.Timedelta(minutes=1) == pd.Timedelta(0) else "%d-%m-%Y %H:%M:%S"
+
+    schedules = {k: wash_schedule(t_start, t_end, k, seed) for k in ENGINEERING_MAP}
+    stops = plant_stops(t_start, t_end, seed)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="cp1252", newline="") as f:
+        for chunk, first in enumerate(range(0, rows, CHUNK_ROWS)):
+            ts = pd.date_range(t_start + first * step, periods=min(CHUNK_ROWS, rows - first), freq=step)
+            cols = simulate_chunk(ts, schedules, stops, seed, chunk)
+            _format_chunk(ts, cols, ts_format, bad_rate, seed, chunk).to_csv(
+                f, sep=";", index=False, header=chunk == 0, lineterminator="\n")
+    os.replace(tmp, path)
+
+    # Fechas con día primero: load_washes las lee con dayfirst=True sin ambigüedad
+    events = sorted((t0, k, rf) for k, s in schedules.items()
+                    for t0, rf in zip(s["t0"][1:], s["rf1"][:-1]) if t_start.value <= t0 <= t_end.value)
+    washes = pd.DataFrame([
+        {"wash_ts": pd.Timestamp(t0).strftime("%d-%m-%Y %H:%M"), "enfriador": WASH_KEY_TO_NAME[k],
+         "tipo": "Limpieza Química", "comentario": f"Sintético (Rf previo {rf * 1e4:.2f}e-4)", "usuario": "generador"}
+        for t0, k, rf in events
+    ], columns=["wash_ts", "enfriador", "tipo", "comentario", "usuario"])
+    if washes_path:
+        washes.to_csv(washes_path, index=False, encoding="utf-8")
+
+    return {"path": path, "washes_path": washes_path, "rows": rows, "freq": freq, "years": years,
+            "seed": seed, "start": str(t_start), "end": str(t_end), "washes": len(washes),
+            "stops": len(stops), "bytes": os.path.getsize(path)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Genera un historian sintético de los enfriadores CAP-3.")
+    parser.add_argument("--years", type=float, default=2.0, help="Años de historia")
+    parser.add_argument("--freq", default="h", help="Frecuencia de muestreo (h, 10min, 1min, ...)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", default="2023-01-01")
+    parser.add_argument("--bad-rate", type=float, default=0.002, help="Fracción de celdas con tokens inválidos")
+    parser.add_argument("--out", default="acid_coolers_CAP3_synthetic_2years.csv")
+    parser.add_argument("--washes-out", default="chemical_washes_CAP3_synthetic.csv")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    info = generate_historian(args.out, args.years, args.freq, args.seed, args.start, args.bad_rate,
+                              args.washes_out)
+    print(f"{info['path']}: {info['rows']:,} filas ({info['start']} → {info['end']}), "
+          f"{info['bytes'] / 1e6:.1f} MB, {info['washes']} lavados, {info['stops']} paradas "
+          f"en {time.perf_counter() - t0:.1f} s")
+    if args.washes_out:
+        print(f"Lavados: {args.washes_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2967 @@
+# ============================================================
+# Motor de cálculo - Enfriadores CAP-3
+# ============================================================
+# Todo el cálculo del dashboard sin Streamlit: carga del historian, modelo
+# térmico, criticidad, ventanas móviles, pirámide de agregados, ML,
+# registro de modelos, pipeline y PDF. Se puede importar desde scripts,
+# benchmarks y procesos hijos sin efectos secundarios.
+#
+# Importaciones diferidas (arranque rápido):
+# - sklearn: dentro de ml_cv, al entrenar o predecir
+# - joblib: al leer/escribir el registro de modelos
+# - reportlab / matplotlib: al generar el PDF
+#
+# Las etapas principales llevan ``@instrumented()`` (perf.py): tiempo,
+# filas de entrada/salida y, si la corrida lo pide, memoria pico.
+# ============================================================
+
+from __future__ import annotations
+
+# ===========================================
+# IMPORTS
+# ===========================================
+import copy
+import csv
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+import ml_cv
+import pdf_figures
+from perf import PERF_LOG, instrumented
+
+# PDF (opcional): se verifica sin importar; reportlab se carga en generate_pdf
+PDF_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ("reportlab", "matplotlib"))
+
+# ===========================================
+# CONFIGURACIÓN Y CONSTANTES
+# ===========================================
+@dataclass(frozen=True)
+class AppConfig:
+    """Configuración global de la aplicación."""
+    PAGE_TITLE: str = "Dashboard Enfriadores CAP-3 v5.0"
+    PAGE_ICON: str = "❄️"
+    DATA_FILE: str = "acid_coolers_CAP3_synthetic_2years.csv"
+    WASH_FILE: str = "chemical_washes_CAP3.csv"
+    LOGO_PATH: str = r"C:\Users\sebam\OneDrive\Desktop\PAS_DCH\control de proceso\ENF_AC\logo_codelco.png"
+    FALLBACK_WINDOW_DAYS: int = 30
+    PRED_HORIZON_DAYS: int = 30
+    LABEL_HORIZONS_DAYS: Tuple[int, ...] = (7, 14, 30, 60)
+    MIN_TRAIN_ROWS: int = 300
+    MIN_POSITIVES: int = 10
+    MIN_NEGATIVES: int = 10
+    CACHE_DIR: str = ".cache_cap3"
+    CACHE_MAX_MB: int = 1024
+    CHART_MAX_POINTS: int = 4000
+    CHART_WEBGL_THRESHOLD: int = 2500
+    CHART_DOWNSAMPLE: str = "minmax"
+    PDF_MAX_POINTS: int = 1500
+    # Subdirectorios de CACHE_DIR que la limpieza del historian no toca (TAG_STORE_DIR_RE)
+    FIGURE_DIR: str = os.path.join(".cache_cap3", "figures")
+    FIGURE_CACHE_MAX: int = 256
+    PDF_WORKERS: Optional[int] = None
+    INCREMENTAL_PIPELINE: bool = True
+    MODEL_DIR: str = os.path.join(".cache_cap3", "models")
+    MODEL_KEEP_VERSIONS: int = 3
+    CV_FOLDS: int = 4
+    CV_WORKERS: Optional[int] = None
+    TRAIN_WORKERS: int = 1
+    ONLINE_MAX_UPDATES: int = 24
+    TRAIN_POLL_SECONDS: float = 2.0
+    PERF_TRACE_MEMORY: bool = False
+
+
+COLORS = {
+    'primary': '#1f77b4', 'secondary': '#ff7f0e', 'success': '#2ca02c',
+    'warning': '#ffbb33', 'danger': '#dc3545', 'info': '#17a2b8',
+    'acid': '#e74c3c', 'water': '#3498db', 'reference': '#95a5a6'
+}
+
+# Mapeo de tags de instrumentación
+BLOWER_TAG = "HIC25020"
+
+ENGINEERING_MAP = {
+    "TS": {
+        "F_w": "FI25168", "T_w_in": "TI25138", "T_w_out": "TI25279",
+        "T_a_in": "TI25084", "T_a_out": "TI25090", "acid_conc": "AIC25114",
+        "bypass": "TV25088", "pump_amp": "322BOC301_IA", "cond_w": "CI25168",
+    },
+    "TAF": {
+        "F_w": "FI25173", "T_w_in": "TI25138", "T_w_out": "TI25279",
+        "T_a_in": "TI25269", "T_a_out": "TI25108", "acid_conc": "AIC25118",
+        "bypass": "TV25106", "pump_amp": "326BOC301_II", "cond_w": "CI25173",
+    },
+    "TAI": {
+        "F_w": "FI25163", "T_w_in": "TI25138", "T_w_out": "TI25279",
+        "T_a_in": "TI24094", "T_a_out": "TI25100", "acid_conc": "AIC25116",
+        "bypass": "TV25098", "pump_amp": "325BOC301_IA", "cond_w": "CI25163",
+    },
+}
+
+WASH_NAME_MAP = {
+    "Secado": "TS", "Absorcion Intermedia": "TAI", "Absorcion Final": "TAF",
+    "TS": "TS", "TAI": "TAI", "TAF": "TAF",
+    "ENF TS": "TS", "ENF TAI": "TAI", "ENF TAF": "TAF",
+    "Torre Secado": "TS", "Torre Interpaso": "TAI", "Torre Final": "TAF",
+}
+
+WASH_KEY_TO_NAME = {"TS": "Secado", "TAI": "Absorcion Intermedia", "TAF": "Absorcion Final"}
+
+DESIGN_PARAMS = {
+    "TS": {
+        "name": "Torre de Secado (5322-ENF-301/401)", "short_name": "Torre Secado",
+        "area_m2": 366.87, "U_clean_Wm2K": 1718, "Q_design_W": 15.39e6,
+        "acid_conc_design": 96.0, "T_acid_in_design": 75.0, "T_acid_out_design": 55.0,
+        "T_acid_out_limit": 60.0, "T_water_in_design": 32.0, "T_water_out_design": 49.0,
+        "LMTD_design": 24.4, "fouling_design_m2KW": 1.43e-4,
+        "acid_flow_design_m3h": 966, "water_flow_design_m3h": 776,
+        "T_acid_in_min": 50.0, "T_acid_in_max": 95.0,
+        "T_acid_out_min": 40.0, "T_acid_out_max": 75.0,
+    },
+    "TAI": {
+        "name": "Torre Interpaso (5325-ENF-301/401)", "short_name": "Torre Interpaso",
+        "area_m2": 415.26, "U_clean_Wm2K": 1670, "Q_design_W": 36.13e6,
+        "acid_conc_design": 98.5, "T_acid_in_design": 109.0, "T_acid_out_design": 77.0,
+        "T_acid_out_limit": 85.0, "T_water_in_design": 32.0, "T_water_out_design": 49.0,
+        "LMTD_design": 52.1, "fouling_design_m2KW": 1.43e-4,
+        "acid_flow_design_m3h": 1439, "water_flow_design_m3h": 1823,
+        "T_acid_in_min": 70.0, "T_acid_in_max": 130.0,
+        "T_acid_out_min": 60.0, "T_acid_out_max": 100.0,
+    },
+    "TAF": {
+        "name": "Torre Final (5326-ENF-301/401)", "short_name": "Torre Final",
+        "area_m2": 92.98, "U_clean_Wm2K": 2070, "Q_design_W": 8.36e6,
+        "acid_conc_design": 98.5, "T_acid_in_design": 91.0, "T_acid_out_design": 77.0,
+        "T_acid_out_limit": 82.0, "T_water_in_design": 32.0, "T_water_out_design": 49.0,
+        "LMTD_design": 43.4, "fouling_design_m2KW": 1.43e-4,
+        "acid_flow_design_m3h": 756, "water_flow_design_m3h": 422,
+        "T_acid_in_min": 65.0, "T_acid_in_max": 120.0,
+        "T_acid_out_min": 55.0, "T_acid_out_max": 95.0,
+    },
+}
+
+# Propiedades del ácido: concentración -> (Cp J/kg·K, densidad kg/m³)
+ACID_PROPS = {
+    0: (4186, 998), 50: (3180, 1395), 70: (2470, 1610), 80: (2100, 1727),
+    90: (1760, 1814), 93: (1680, 1830), 96: (1560, 1836), 98: (1430, 1836),
+    98.5: (1400, 1835), 100: (1340, 1830),
+}
+
+
+# ===========================================
+# FUNCIONES AUXILIARES
+# ===========================================
+def fmt(value: Any, template: str = "{:.2f}", na: str = "N/D") -> str:
+    """Formatea un valor numérico de forma segura."""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or pd.isna(value):
+        return na
+    try:
+        return template.format(float(value))
+    except (ValueError, TypeError):
+        return na
+
+
+NUMERIC_BAD_TOKENS = ("bad input", "badinput", "error", "nan", "-", "")
+
+
+def to_numeric(series: pd.Series, report: Optional[Dict[str, int]] = None) -> pd.Series:
+    """
+    Convierte una serie a numérico, limpiando valores inválidos.
+    
+    Las columnas ya numéricas se devuelven como float sin pasar por texto. Las
+    de texto se convierten en una sola pasada con ``pd.to_numeric``; solo los
+    valores que fallan se reintentan con coma decimal. Tokens como "Bad Input",
+    "Error" o "-" quedan como NaN. Si se entrega ``report`` se llena con
+    conteos: ``total``, ``missing`` (vacíos en origen), ``bad_tokens``,
+    ``decimal_comma`` y ``coerced_nan`` (valores no vacíos que quedaron NaN).
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        out = series if series.dtype == np.float64 else series.astype(np.float64)
+        if report is not None:
+            missing = int(out.isna().sum())
+            report.update(total=len(out), missing=missing, bad_tokens=0, decimal_comma=0, coerced_nan=0)
+        return out
+    
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+    present = series.notna().to_numpy()
+    failed = np.flatnonzero(np.isnan(values) & present)
+    n_comma = n_bad = 0
+    if len(failed):
+        # Solo los valores que fallaron pasan por texto
+        retry = series.iloc[failed].astype(str).str.strip()
+        has_comma = retry.str.contains(",", regex=False).to_numpy()
+        if has_comma.any():
+            fixed = pd.to_numeric(retry[has_comma].str.replace(",", ".", regex=False), errors="coerce").to_numpy(dtype=np.float64)
+            ok = ~np.isnan(fixed)
+            values[failed[has_comma][ok]] = fixed[ok]
+            n_comma = int(ok.sum())
+        if report is not None:
+            lowered = retry.str.lower()
+            n_bad = int((lowered.isin(NUMERIC_BAD_TOKENS) | lowered.str.startswith(("bad", "error"))).sum())
+    
+    if report is not None:
+        report.update(total=len(values), missing=int((~present).sum()), bad_tokens=n_bad,
+                      decimal_comma=n_comma, coerced_nan=len(failed) - n_comma)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def get_acid_properties(conc_pct: float) -> Tuple[float, float]:
+    """Obtiene Cp y densidad del ácido por interpolación."""
+    if pd.isna(conc_pct):
+        return np.nan, np.nan
+    concs = sorted(ACID_PROPS.keys())
+    cps = [ACID_PROPS[c][0] for c in concs]
+    rhos = [ACID_PROPS[c][1] for c in concs]
+    return float(np.interp(conc_pct, concs, cps)), float(np.interp(conc_pct, concs, rhos))
+
+
+_ACID_CONCS = np.array(sorted(ACID_PROPS), dtype=float)
+_ACID_CPS = np.array([ACID_PROPS[c][0] for c in sorted(ACID_PROPS)], dtype=float)
+_ACID_RHOS = np.array([ACID_PROPS[c][1] for c in sorted(ACID_PROPS)], dtype=float)
+
+
+def acid_properties_array(conc_pct: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Versión vectorizada de ``get_acid_properties`` (una sola interpolación por arreglo)."""
+    conc = np.asarray(conc_pct, dtype=float)
+    nan = np.isnan(conc)
+    cp = np.interp(conc, _ACID_CONCS, _ACID_CPS)
+    rho = np.interp(conc, _ACID_CONCS, _ACID_RHOS)
+    cp[nan] = np.nan
+    rho[nan] = np.nan
+    return cp, rho
+
+
+def lmtd_array(T_hot_in: np.ndarray, T_hot_out: np.ndarray, T_cold_in: np.ndarray, T_cold_out: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de ``safe_lmtd`` con máscaras (mismos resultados fila a fila)."""
+    dT1 = np.asarray(T_hot_in, dtype=float) - np.asarray(T_cold_out, dtype=float)
+    dT2 = np.asarray(T_hot_out, dtype=float) - np.asarray(T_cold_in, dtype=float)
+    out = np.full(dT1.shape, np.nan)
+    
+    valid = (dT1 > 0) & (dT2 > 0)
+    with np.errstate(invalid="ignore"):
+        near = valid & (np.abs(dT1 - dT2) < 1e-6)
+    general = valid & ~near
+    out[near] = dT1[near]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[general] = (dT1[general] - dT2[general]) / np.log(dT1[general] / dT2[general])
+    return out
+
+
+def safe_lmtd(T_hot_in: float, T_hot_out: float, T_cold_in: float, T_cold_out: float) -> float:
+    """Calcula LMTD de forma segura."""
+    dT1 = T_hot_in - T_cold_out
+    dT2 = T_hot_out - T_cold_in
+    if np.isnan(dT1) or np.isnan(dT2) or dT1 <= 0 or dT2 <= 0:
+        return np.nan
+    if abs(dT1 - dT2) < 1e-6:
+        return float(dT1)
+    return float((dT1 - dT2) / np.log(dT1 / dT2))
+
+
+# ===========================================
+# CARGA DE DATOS
+# ===========================================
+CSV_ENCODINGS = ["utf-8-sig", "utf-8", "cp1252", "latin1"]
+CSV_SEPARATORS = [";", ",", "\t"]
+SNIFF_BYTES = 64 * 1024
+SNIFF_LINES = 50
+
+
+@dataclass(frozen=True)
+class CsvDialect:
+    """Dialecto detectado de un CSV y costo de su lectura."""
+    encoding: str
+    sep: str
+    engine: str = ""
+    parse_seconds: float = 0.0
+
+    def describe(self) -> str:
+        sep = {"\t": "TAB"}.get(self.sep, self.sep)
+        return f"{self.encoding} · sep '{sep}' · {self.engine} · {self.parse_seconds:.2f} s"
+
+
+def sniff_csv_dialect(path: str, n_bytes: int = SNIFF_BYTES) -> CsvDialect:
+    """Detecta encoding y separador a partir de un prefijo del archivo."""
+    with open(path, "rb") as fh:
+        head = fh.read(n_bytes)
+    truncated = len(head) == n_bytes
+    
+    # Encoding: primer candidato que decodifica el prefijo completo
+    encoding, text = "latin1", ""
+    for enc in CSV_ENCODINGS:
+        if enc == "utf-8-sig" and not head.startswith(b"\xef\xbb\xbf"):
+            continue
+        raw = head
+        if truncated and enc.startswith("utf-8"):
+            # Evitar cortar un carácter multibyte al final del prefijo
+            raw = head[:head.rfind(b"\n") + 1] or head
+        try:
+            text = raw.decode(enc)
+            encoding = enc
+            break
+        except UnicodeDecodeError:
+            continue
+    
+    lines = [ln for ln in text.splitlines() if ln.strip()]
+    if truncated and len(lines) > 1:
+        lines = lines[:-1]
+    lines = lines[:SNIFF_LINES]
+    
+    # Separador: más columnas con conteo consistente entre filas
+    best_sep, best_score = CSV_SEPARATORS[0], (-1, 0)
+    for sep in CSV_SEPARATORS:
+        try:
+            widths = [len(row) for row in csv.reader(lines, delimiter=sep)]
+        except csv.Error:
+            continue
+        if not widths:
+            continue
+        n_cols = widths[0]
+        consistent = sum(w == n_cols for w in widths) / len(widths)
+        score = (n_cols if consistent >= 0.8 else 0, n_cols)
+        if score > best_score:
+            best_sep, best_score = sep, score
+    
+    return CsvDialect(encoding=encoding, sep=best_sep)
+
+
+def _csv_engines() -> List[str]:
+    """Motores de lectura en orden de preferencia."""
+    engines = ["pyarrow"] if importlib.util.find_spec("pyarrow") is not None else []
+    return engines + ["c", "python"]
+
+
+@instrumented()
+def read_csv_auto(path: str) -> pd.DataFrame:
+    """
+    Lee CSV detectando encoding y separador con una sola lectura completa.
+    
+    El dialecto se decide sobre un prefijo de ``SNIFF_BYTES`` y luego se parsea
+    el archivo una vez con el motor más rápido disponible (pyarrow → C → python).
+    El dialecto elegido y el tiempo de parseo quedan en ``df.attrs["csv_dialect"]``.
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    
+    dialect = sniff_csv_dialect(path)
+    df = None
+    for engine in _csv_engines():
+        t0 = time.perf_counter()
+        try:
+            df = pd.read_csv(path, encoding=dialect.encoding, sep=dialect.sep,
+                             engine=engine, on_bad_lines="skip")
+        except (UnicodeDecodeError, ValueError, pd.errors.ParserError):
+            continue
+        dialect = replace(dialect, engine=engine, parse_seconds=time.perf_counter() - t0)
+        break
+    
+    if df is None:
+        return pd.DataFrame()
+    
+    header = [str(c) for c in df.columns]
+    df = _normalize_columns(df)
+    df.attrs["csv_dialect"] = dialect
+    df.attrs["csv_header"] = header
+    return df
+
+
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpia nombres de columnas (espacios, BOM) y elimina duplicados."""
+    df.columns = [str(c).strip().replace("\ufeff", "") for c in df.columns]
+    if df.columns.duplicated().any():
+        df = df.loc[:, ~df.columns.duplicated()].copy()
+    return df
+
+
+def find_timestamp_col(df: pd.DataFrame) -> str:
+    """Encuentra la columna de timestamp."""
+    for c in df.columns:
+        nc = str(c).strip().lower().replace(" ", "").replace("_", "")
+        if nc in ["timestamp", "datetime", "fechahora"]:
+            return c
+    return df.columns[0]
+
+
+@instrumented()
+def load_washes(path: str) -> pd.DataFrame:
+    """Carga historial de lavados."""
+    empty = pd.DataFrame(columns=["wash_ts", "enfriador", "enfriador_key", "tipo", "comentario", "usuario"])
+    if not os.path.exists(path):
+        return empty
+    
+    try:
+        df = pd.read_csv(path, encoding='utf-8')
+    except UnicodeDecodeError:
+        try:
+            df = pd.read_csv(path, encoding='latin1')
+        except Exception:
+            return empty
+    
+    if df.empty:
+        return empty
+    
+    df.columns = [c.strip().lower() for c in df.columns]
+    
+    # Mapear columnas
+    rename = {}
+    for c in df.columns:
+        if ('wash' in c and 'ts' in c) or c in ['fecha', 'date', 'timestamp', 'datetime', 'fechahora']:
+            rename[c] = 'wash_ts'
+        elif c in ['equipo', 'cooler', 'enfriador']:
+            rename[c] = 'enfriador'
+    df = df.rename(columns=rename)
+    
+    df['wash_ts'] = pd.to_datetime(df['wash_ts'], errors='coerce', dayfirst=True)
+    df = df.dropna(subset=['wash_ts'])
+    df['enfriador'] = df.get('enfriador', '').astype(str)
+    df['enfriador_key'] = df['enfriador'].map(lambda x: WASH_NAME_MAP.get(str(x).strip()))
+    
+    for c in ["tipo", "comentario", "usuario"]:
+        if c not in df.columns:
+            df[c] = ""
+    
+    return df[["wash_ts", "enfriador", "enfriador_key", "tipo", "comentario", "usuario"]].sort_values('wash_ts')
+
+
+def save_wash(path: str, wash_date: datetime, enf_key: str, tipo: str, comentario: str, usuario: str) -> bool:
+    """Guarda un nuevo lavado."""
+    new_row = pd.DataFrame([{
+        'wash_ts': wash_date.strftime('%Y-%m-%d %H:%M:%S'),
+        'enfriador': WASH_KEY_TO_NAME.get(enf_key, enf_key),
+        'tipo': tipo, 'comentario': comentario, 'usuario': usuario
+    }])
+    
+    try:
+        if os.path.exists(path):
+            df = pd.read_csv(path, encoding='utf-8')
+            df = pd.concat([df, new_row], ignore_index=True)
+        else:
+            df = new_row
+        df.to_csv(path, index=False, encoding='utf-8')
+        return True
+    except Exception:
+        return False
+
+
+# ===========================================
+# ALMACÉN DE TAGS (MEMORY-MAPPED)
+# ===========================================
+HISTORIAN_CACHE_VERSION = 4
+TS_FILE = "ts.i8"
+EDGE_BYTES = 4096
+# Directorios de datos del almacén: "<clave>-<hash12>". El resto de CACHE_DIR
+# (registro de modelos, caché de figuras) no pertenece al almacén.
+TAG_STORE_DIR_RE = re.compile(r"^[0-9a-f]{20}-[0-9a-f]{12}$")
+LOCK_FILE = "historian.lock"
+_HISTORIAN_LOCK = threading.Lock()
+
+try:
+    import fcntl
+except ImportError:  # Windows: un archivo mapeado no se puede achicar; basta el lock entre hilos
+    fcntl = None
+
+
+@contextmanager
+def _historian_lock(cache_dir: str) -> Iterator[None]:
+    """
+    Exclusión entre hilos y entre procesos del dashboard que comparten
+    ``cache_dir`` (``flock`` sobre ``LOCK_FILE``) para leer el meta, agregar
+    filas y escribir el meta como una sola operación.
+    """
+    with _HISTORIAN_LOCK:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(cache_dir, LOCK_FILE), "a+b") as fh:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def historian_tags() -> List[str]:
+    """Tags de proceso usados por el modelo, sin duplicados."""
+    tags = []
+    for mapping in ENGINEERING_MAP.values():
+        for tag in mapping.values():
+            if tag not in tags:
+                tags.append(tag)
+    tags.append(BLOWER_TAG)
+    return tags
+
+
+def file_content_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash del contenido completo de un archivo (lectura por bloques)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@instrumented()
+def clean_historian(df_raw: pd.DataFrame) -> Tuple[pd.DataFrame, str]:
+    """Deja solo timestamp y tags numéricos, ordenado por tiempo."""
+    ts_col = find_timestamp_col(df_raw)
+    out = pd.DataFrame({ts_col: pd.to_datetime(df_raw[ts_col], errors="coerce", dayfirst=True)})
+    report = {}
+    for tag in historian_tags():
+        if tag in df_raw.columns:
+            report[tag] = {}
+            out[tag] = to_numeric(df_raw[tag], report[tag])
+    out = out.dropna(subset=[ts_col]).sort_values(ts_col).reset_index(drop=True)
+    out.attrs["numeric_report"] = report
+    return out, ts_col
+
+
+def merge_numeric_reports(base: Dict[str, Dict[str, int]], extra: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    """Suma conteos de limpieza por tag (carga completa + colas incrementales)."""
+    merged = {tag: dict(counts) for tag, counts in base.items()}
+    for tag, counts in extra.items():
+        acc = merged.setdefault(tag, {})
+        for k, v in counts.items():
+            acc[k] = acc.get(k, 0) + v
+    return merged
+
+
+def numeric_report_frame(report: Dict[str, Dict[str, int]]) -> pd.DataFrame:
+    """Tabla de conteos de limpieza numérica por tag."""
+    cols = ["total", "missing", "bad_tokens", "decimal_comma", "coerced_nan"]
+    if not report:
+        return pd.DataFrame(columns=["Tag"] + cols)
+    df = pd.DataFrame.from_dict(report, orient="index").reindex(columns=cols).fillna(0).astype(int)
+    return df.rename_axis("Tag").reset_index()
+
+
+@dataclass(frozen=True)
+class TagStore:
+    """
+    Historian en disco: un arreglo contiguo por tag más timestamps int64 (ns).
+    
+    Los arreglos se abren con ``np.memmap`` en modo lectura, de modo que varios
+    procesos del dashboard comparten las mismas páginas del cache del sistema.
+    """
+    root: str
+    ts_col: str
+    rows: int
+    files: Dict[str, str]
+    
+    def _map(self, name: str, dtype: str) -> np.ndarray:
+        if self.rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.root, name), dtype=dtype, mode="r", shape=(self.rows,))
+    
+    @property
+    def tags(self) -> List[str]:
+        return list(self.files)
+    
+    def timestamps(self) -> np.ndarray:
+        """Timestamps como vista ``datetime64[ns]`` sin copia."""
+        return self._map(TS_FILE, "<i8").view("datetime64[ns]")
+    
+    def tag(self, tag: str) -> np.ndarray:
+        """Serie float64 de un tag como vista de solo lectura."""
+        return self._map(self.files[tag], "<f8")
+    
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame ancho cuyas columnas son vistas de los memmaps."""
+        cols = {self.ts_col: pd.Series(self.timestamps(), copy=False)}
+        for tag in self.files:
+            cols[tag] = pd.Series(self.tag(tag), copy=False)
+        return pd.DataFrame(cols, copy=False)
+
+
+def write_tag_store(root: str, df: pd.DataFrame, ts_col: str) -> TagStore:
+    """
+    Escribe un historian limpio como arreglos binarios por tag. Cada archivo
+    se escribe aparte y se reemplaza con ``os.replace``: si el directorio ya
+    existía, quien lo tenga mapeado conserva el archivo anterior.
+    """
+    os.makedirs(root, exist_ok=True)
+    
+    def write(name: str, values: np.ndarray) -> None:
+        tmp = os.path.join(root, f"{name}.tmp{os.getpid()}")
+        values.tofile(tmp)
+        os.replace(tmp, os.path.join(root, name))
+    
+    write(TS_FILE, df[ts_col].to_numpy(dtype="datetime64[ns]").view("<i8"))
+    files = {}
+    for i, tag in enumerate(c for c in df.columns if c != ts_col):
+        files[tag] = f"c{i:03d}.f8"
+        write(files[tag], df[tag].to_numpy(dtype="<f8"))
+    return TagStore(root=root, ts_col=ts_col, rows=len(df), files=files)
+
+
+def _cache_key(path: str) -> str:
+    """Clave de caché: ruta absoluta + versión de formato + tags."""
+    raw = f"{os.path.abspath(path)}|{HISTORIAN_CACHE_VERSION}|{','.join(historian_tags())}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def _read_cache_meta(meta_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path: str, payload: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh)
+    os.replace(tmp, path)
+
+
+def _dir_size(path: str) -> int:
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+
+def _evict_lru(cache_dir: str, max_bytes: int, keep: str) -> None:
+    """
+    Elimina entradas menos usadas hasta respetar el tope de tamaño.
+    
+    También borra directorios de datos que ya no referencia ninguna entrada
+    (versiones reemplazadas); solo toca nombres con el formato del almacén
+    (``TAG_STORE_DIR_RE``), nunca otros subdirectorios. Si otro proceso aún los tiene mapeados y el
+    sistema no permite borrarlos, se reintenta en la próxima escritura.
+    """
+    entries, live = [], set()
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        meta = _read_cache_meta(os.path.join(cache_dir, name)) or {}
+        entries.append((float(meta.get("last_access", 0.0)), name[:-5], meta))
+        live.add(meta.get("data_dir"))
+    
+    for name in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, name)
+        if TAG_STORE_DIR_RE.match(name) and os.path.isdir(full) and name not in live:
+            shutil.rmtree(full, ignore_errors=True)
+    
+    total = sum(int(m.get("bytes", 0)) for _, _, m in entries)
+    for _, key, meta in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, f"{key}.json"))
+        except OSError:
+            continue
+        if TAG_STORE_DIR_RE.match(str(meta.get("data_dir") or "")):
+            shutil.rmtree(os.path.join(cache_dir, meta["data_dir"]), ignore_errors=True)
+        total -= int(meta.get("bytes", 0))
+
+
+def _edge_hash(path: str, end: int, size: int = EDGE_BYTES) -> str:
+    """Hash de los ``size`` bytes que terminan en ``end`` (detecta rotación/reescritura)."""
+    start = max(0, end - size)
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        return hashlib.blake2b(fh.read(end - start), digest_size=16).hexdigest()
+
+
+def _complete_offset(path: str, size: int) -> int:
+    """Offset tras el último salto de línea (ignora una fila a medio escribir)."""
+    with open(path, "rb") as fh:
+        fh.seek(max(0, size - EDGE_BYTES))
+        tail = fh.read()
+    cut = tail.rfind(b"\n")
+    return size if cut < 0 else size - len(tail) + cut + 1
+
+
+def _read_csv_tail(path: str, offset: int, meta: Dict[str, Any]) -> Tuple[pd.DataFrame, int]:
+    """Parsea solo las filas completas agregadas después de ``offset``."""
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        chunk = fh.read()
+    cut = chunk.rfind(b"\n") + 1
+    if cut == 0:
+        return pd.DataFrame(), offset
+    
+    dialect = meta["dialect"]
+    header = meta["csv_header"]
+    df = pd.read_csv(io.BytesIO(chunk[:cut]), encoding=dialect["encoding"], sep=dialect["sep"],
+                     header=None, names=list(range(len(header))), engine="c", on_bad_lines="skip")
+    df.columns = header
+    return _normalize_columns(df), offset + cut
+
+
+def append_tag_store(store: TagStore, df: pd.DataFrame) -> TagStore:
+    """
+    Agrega filas al final de cada arreglo del store (escritura posicional,
+    bajo ``_historian_lock``).
+    
+    Los archivos nunca se achican: otros procesos pueden tener mapeadas las
+    primeras ``store.rows`` filas, y leer una página truncada da SIGBUS. Bytes
+    sobrantes de un intento interrumpido quedan fuera de ``rows`` y se
+    sobrescriben.
+    """
+    parts = [(TS_FILE, df[store.ts_col].to_numpy(dtype="datetime64[ns]").view("<i8"))]
+    for tag, name in store.files.items():
+        values = df[tag].to_numpy(dtype="<f8") if tag in df.columns else np.full(len(df), np.nan)
+        parts.append((name, values))
+    for name, values in parts:
+        with open(os.path.join(store.root, name), "r+b") as fh:
+            fh.seek(store.rows * values.itemsize)
+            fh.write(values.tobytes())
+    return replace(store, rows=store.rows + len(df))
+
+
+def _store_from_meta(cache_dir: str, meta: Dict[str, Any]) -> TagStore:
+    return TagStore(root=os.path.join(cache_dir, meta["data_dir"]), ts_col=meta["ts_col"],
+                    rows=int(meta["rows"]), files=meta["files"])
+
+
+def _frame_from_store(store: TagStore, meta: Dict[str, Any], t0: float, cache_hit: bool,
+                      appended: int = 0, parent_version: str = "") -> pd.DataFrame:
+    df = store.to_frame()
+    df.attrs["csv_dialect"] = CsvDialect(**meta["dialect"])
+    df.attrs["numeric_report"] = meta.get("numeric_report", {})
+    df.attrs["cache_hit"] = cache_hit
+    df.attrs["rows_appended"] = appended
+    df.attrs["data_version"] = meta["data_version"]
+    df.attrs["parent_version"] = parent_version
+    df.attrs["load_seconds"] = time.perf_counter() - t0
+    return df
+
+
+@instrumented()
+def load_historian(path: str, cache_dir: str = ".cache_cap3", max_mb: int = 1024) -> Tuple[pd.DataFrame, str]:
+    """
+    Carga el historian limpio y tipado desde un ``TagStore`` en disco.
+    
+    Casos, según el estado del archivo fuente respecto a la entrada en caché:
+    
+    - mismo tamaño y mtime (o mismo hash de contenido): se reutiliza el store.
+    - archivo más largo con el mismo inicio y el mismo borde en el último
+      offset ingerido: solo se parsea la cola nueva y se agrega al store, si
+      todas sus filas son posteriores al último timestamp ingerido.
+    - cualquier otro caso (truncado, rotado, reescrito, o una cola con filas
+      atrasadas o corregidas): reconstrucción completa, que ordena y conserva
+      todas las filas igual que una carga en frío.
+    
+    Las columnas del DataFrame devuelto son vistas de solo lectura de los
+    memmaps. El directorio de caché se limita a ``max_mb`` eliminando las
+    entradas menos usadas (LRU). En ``df.attrs`` quedan ``csv_dialect``,
+    ``cache_hit``, ``rows_appended``, ``data_version``, ``parent_version``
+    (versión previa cuando solo se agregaron filas) y ``load_seconds``.
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(), ""
+    
+    t0 = time.perf_counter()
+    key = _cache_key(path)
+    meta_path = os.path.join(cache_dir, f"{key}.json")
+    
+    with _historian_lock(cache_dir):
+        stat = os.stat(path)
+        meta = _read_cache_meta(meta_path)
+        if meta and not os.path.isdir(os.path.join(cache_dir, meta.get("data_dir", ""))):
+            meta = None
+        
+        content_hash = None
+        if meta and meta.get("size") == stat.st_size:
+            fresh = meta.get("mtime_ns") == stat.st_mtime_ns
+            if not fresh and meta.get("content_hash"):
+                content_hash = file_content_hash(path)
+                fresh = content_hash == meta["content_hash"]
+            if fresh:
+                meta.update(mtime_ns=stat.st_mtime_ns, last_access=time.time())
+                try:
+                    _write_json_atomic(meta_path, meta)
+                except OSError:
+                    pass
+                return _frame_from_store(_store_from_meta(cache_dir, meta), meta, t0, True), meta["ts_col"]
+        
+        # Ingesta incremental de la cola
+        offset = int(meta.get("byte_offset", 0)) if meta else 0
+        if (meta and 0 < offset < stat.st_size
+                and _edge_hash(path, min(EDGE_BYTES, offset)) == meta.get("head_hash")
+                and _edge_hash(path, offset) == meta.get("edge_hash")):
+            try:
+                tail, new_offset = _read_csv_tail(path, offset, meta)
+                store = _store_from_meta(cache_dir, meta)
+                appended = 0
+                parent_version = meta["data_version"]
+                if not tail.empty and meta["ts_col"] in tail.columns:
+                    tail, _ = clean_historian(tail)
+                    if (tail[meta["ts_col"]] <= pd.Timestamp(meta["last_ts"])).any():
+                        # Filas atrasadas: agregarlas al final desordenaría el store
+                        raise ValueError("cola con timestamps no posteriores al último ingerido")
+                    meta["numeric_report"] = merge_numeric_reports(meta.get("numeric_report", {}),
+                                                                   tail.attrs["numeric_report"])
+                    if not tail.empty:
+                        store = append_tag_store(store, tail)
+                        appended = len(tail)
+                        meta["last_ts"] = str(tail[meta["ts_col"]].iloc[-1])
+                if appended:
+                    # Versión encadenada: hash de la cola + versión anterior
+                    with open(path, "rb") as fh:
+                        fh.seek(offset)
+                        chained = hashlib.blake2b(fh.read(new_offset - offset), digest_size=16)
+                    chained.update(meta["data_version"].encode("ascii"))
+                    meta["data_version"] = chained.hexdigest()
+                meta.update(
+                    size=stat.st_size, mtime_ns=stat.st_mtime_ns, byte_offset=new_offset,
+                    edge_hash=_edge_hash(path, new_offset), rows=store.rows, content_hash=None,
+                    bytes=_dir_size(store.root), last_access=time.time(),
+                )
+                _write_json_atomic(meta_path, meta)
+                return _frame_from_store(store, meta, t0, True, appended,
+                                         parent_version if appended else ""), meta["ts_col"]
+            except (OSError, ValueError, KeyError, pd.errors.ParserError):
+                pass
+        
+        # Reconstrucción completa desde el CSV
+        df_raw = read_csv_auto(path)
+        if df_raw.empty:
+            return pd.DataFrame(), ""
+        dialect = df_raw.attrs.get("csv_dialect", CsvDialect(encoding="", sep=""))
+        header = df_raw.attrs.get("csv_header", list(df_raw.columns))
+        df, ts_col = clean_historian(df_raw)
+        report = df.attrs.get("numeric_report", {})
+        del df_raw
+        content_hash = content_hash or file_content_hash(path)
+        offset = _complete_offset(path, stat.st_size)
+        
+        try:
+            # Directorio nuevo por versión: no se pisan archivos mapeados por otros procesos
+            data_dir = f"{key}-{content_hash[:12]}"
+            store = write_tag_store(os.path.join(cache_dir, data_dir), df, ts_col)
+            meta = {
+                "path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                "content_hash": content_hash, "data_version": content_hash,
+                "version": HISTORIAN_CACHE_VERSION, "ts_col": ts_col, "rows": store.rows,
+                "files": store.files, "data_dir": data_dir, "dialect": asdict(dialect),
+                "csv_header": header, "numeric_report": report, "byte_offset": offset,
+                "head_hash": _edge_hash(path, min(EDGE_BYTES, offset)), "edge_hash": _edge_hash(path, offset),
+                "last_ts": str(df[ts_col].iloc[-1]) if len(df) else str(pd.Timestamp.min),
+                "bytes": _dir_size(store.root), "last_access": time.time(),
+            }
+            _write_json_atomic(meta_path, meta)
+            _evict_lru(cache_dir, max_mb * 1024 * 1024, keep=key)
+            df = store.to_frame()
+        except OSError:
+            pass
+    
+    df.attrs["csv_dialect"] = dialect
+    df.attrs["numeric_report"] = report
+    df.attrs["cache_hit"] = False
+    df.attrs["rows_appended"] = 0
+    df.attrs["data_version"] = content_hash
+    df.attrs["parent_version"] = ""
+    df.attrs["load_seconds"] = time.perf_counter() - t0
+    return df, ts_col
+
+
+# ===========================================
+# TRANSFORMACIÓN DE DATOS
+# ===========================================
+COOLER_FIELDS = ["F_w", "T_w_in", "T_w_out", "T_a_in", "T_a_out", "acid_conc", "bypass", "pump_amp", "cond_w"]
+
+
+@instrumented()
+def build_cooler_frames(df_wide: pd.DataFrame, ts_col: str) -> Dict[str, pd.DataFrame]:
+    """
+    Construye un DataFrame por enfriador directamente desde el formato ancho.
+    
+    Cada tag distinto se convierte una sola vez y los arreglos se comparten
+    entre enfriadores (timestamp, TI25138/TI25279, soplador), sin concatenar
+    un formato largo ni filtrar por texto.
+    """
+    n = len(df_wide)
+    ts = df_wide[ts_col].to_numpy()
+    converted: Dict[str, np.ndarray] = {}
+    missing = np.full(n, np.nan)
+    
+    def tag_values(tag: str) -> np.ndarray:
+        if tag not in converted:
+            converted[tag] = to_numeric(df_wide[tag]).to_numpy() if tag in df_wide.columns else missing
+        return converted[tag]
+    
+    frames = {}
+    for key, tags in ENGINEERING_MAP.items():
+        cols = {ts_col: ts}
+        for field in COOLER_FIELDS:
+            cols[field] = tag_values(tags[field])
+        if BLOWER_TAG in df_wide.columns:
+            cols["blower_speed"] = tag_values(BLOWER_TAG)
+        frames[key] = pd.DataFrame(cols, copy=False)
+    return frames
+
+
+@instrumented()
+def explode_wide_to_long(df_wide: pd.DataFrame, ts_col: str) -> pd.DataFrame:
+    """Transforma datos de formato ancho a largo."""
+    frames = []
+    for key, df_e in build_cooler_frames(df_wide, ts_col).items():
+        df_e = df_e.copy(deep=False)
+        df_e.insert(1, "Enfriador", f"ENF {key}")
+        df_e.insert(2, "Enfriador_Key", key)
+        frames.append(df_e)
+    return pd.concat(frames, ignore_index=True)
+
+
+@instrumented()
+def filter_operation(df: pd.DataFrame, enf_key: str, min_blower: float = 50.0, min_flow_pct: float = 30.0) -> pd.DataFrame:
+    """Filtra datos a operación normal."""
+    if enf_key not in DESIGN_PARAMS:
+        df = df.copy()
+        df["en_operacion"] = 0
+        return df
+    
+    dsg = DESIGN_PARAMS[enf_key]
+    out = df.copy(deep=False)
+    
+    mask = (
+        (out["T_a_in"] >= dsg["T_acid_in_min"]) & (out["T_a_in"] <= dsg["T_acid_in_max"]) &
+        (out["T_a_out"] >= dsg["T_acid_out_min"]) & (out["T_a_out"] <= dsg["T_acid_out_max"]) &
+        (out["F_w"] >= dsg["water_flow_design_m3h"] * min_flow_pct / 100) &
+        ((out["T_a_in"] - out["T_a_out"]) > 0.5) &
+        (out["T_w_in"] >= 15) & (out["T_w_in"] <= 50) &
+        (out["T_w_out"] > out["T_w_in"])
+    )
+    
+    if "blower_speed" in out.columns:
+        mask &= out["blower_speed"] >= min_blower
+    
+    out["en_operacion"] = mask.astype(int)
+    return out
+
+
+@instrumented()
+def apply_thermal_model(df: pd.DataFrame, ts_col: str, enf_key: str) -> pd.DataFrame:
+    """Aplica modelo térmico."""
+    if enf_key not in DESIGN_PARAMS:
+        return df
+    
+    dsg = DESIGN_PARAMS[enf_key]
+    # Solo se agregan columnas: basta una copia superficial sobre las entradas
+    out = df if df[ts_col].is_monotonic_increasing else df.sort_values(ts_col)
+    out = out.copy(deep=False)
+    
+    # Propiedades agua
+    rho_w, cp_w = 1000.0, 4186.0
+    out["F_w_kgs"] = (out["F_w"] / 3600.0) * rho_w
+    
+    # Propiedades ácido
+    out["cp_acid"], out["rho_acid"] = acid_properties_array(out["acid_conc"].to_numpy(dtype=float))
+    
+    # Calor
+    out["Q_water_W"] = out["F_w_kgs"] * cp_w * (out["T_w_out"] - out["T_w_in"])
+    dTa = (out["T_a_in"] - out["T_a_out"]).replace(0, np.nan)
+    out["dT_acid"] = dTa
+    out["m_acid_est"] = (out["Q_water_W"] / (out["cp_acid"] * dTa)).replace([np.inf, -np.inf], np.nan)
+    out["Q_acid_est"] = out["m_acid_est"] * out["cp_acid"] * dTa
+    out["Q_used_W"] = np.minimum(out["Q_water_W"].abs(), out["Q_acid_est"].abs())
+    
+    # LMTD y U
+    out["LMTD_K"] = lmtd_array(out["T_a_in"].to_numpy(dtype=float), out["T_a_out"].to_numpy(dtype=float),
+                               out["T_w_in"].to_numpy(dtype=float), out["T_w_out"].to_numpy(dtype=float))
+    out["UA_WK"] = out["Q_used_W"] / out["LMTD_K"]
+    out["U_Wm2K"] = out["UA_WK"] / dsg["area_m2"]
+    
+    # Rf
+    U_clean = dsg["U_clean_Wm2K"]
+    out["Rf_m2K_W"] = np.where(
+        (out["en_operacion"] == 1) & (out["U_Wm2K"] > 0) & (out["U_Wm2K"] < U_clean * 1.5),
+        (1.0 / out["U_Wm2K"]) - (1.0 / U_clean), np.nan
+    )
+    out["Rf_x1e4"] = (out["Rf_m2K_W"] * 1e4).clip(lower=-0.5)
+    
+    # Eficiencias
+    out["eff_Q_pct"] = (out["Q_used_W"] / dsg["Q_design_W"]) * 100
+    out["eff_U_pct"] = (out["U_Wm2K"] / U_clean) * 100
+    
+    return out
+
+
+@instrumented()
+def add_wash_features(df: pd.DataFrame, washes: pd.DataFrame, ts_col: str, enf_key: str) -> pd.DataFrame:
+    """Agrega features de lavados."""
+    out = df.copy(deep=False)
+    
+    if washes is None or washes.empty:
+        out["days_since_wash"] = np.nan
+        out["wash_in_last_30d"] = 0
+        return out
+    
+    w = washes[washes["enfriador_key"] == enf_key]
+    if w.empty:
+        out["days_since_wash"] = np.nan
+        out["wash_in_last_30d"] = 0
+        return out
+    
+    last_wash = pd.to_datetime(w["wash_ts"]).max()
+    out["days_since_wash"] = (out[ts_col] - last_wash).dt.total_seconds() / 86400
+    out["wash_in_last_30d"] = (out["days_since_wash"] <= 30).astype(int)
+    return out
+
+
+@instrumented()
+def calculate_criticidad(df: pd.DataFrame, enf_key: str) -> pd.DataFrame:
+    """Calcula índice de criticidad."""
+    if enf_key not in DESIGN_PARAMS:
+        return df
+    
+    dsg = DESIGN_PARAMS[enf_key]
+    out = df.copy(deep=False)
+    mask_op = out["en_operacion"] == 1
+    
+    T_limit = dsg["T_acid_out_limit"]
+    Rf_crit = dsg["fouling_design_m2KW"] * 1e4 * 5
+    
+    out["crit_temp"] = np.where(mask_op, (out["T_a_out"] / T_limit).clip(0, 1.5), np.nan)
+    out["crit_fouling"] = np.where(mask_op & out["Rf_x1e4"].notna(), (out["Rf_x1e4"] / Rf_crit).clip(0, 1.5), np.nan)
+    out["crit_eff"] = np.where(mask_op, (1 - out["eff_U_pct"] / 100).clip(0, 1), np.nan)
+    out["crit_wash"] = np.where(out["days_since_wash"].notna(), (out["days_since_wash"] / 180).clip(0, 1.5), 0.5)
+    
+    out["criticidad"] = np.where(
+        mask_op,
+        100 * (0.30 * out["crit_temp"].fillna(0) + 0.35 * out["crit_fouling"].fillna(0) +
+               0.25 * out["crit_eff"].fillna(0) + 0.10 * out["crit_wash"].fillna(0)),
+        np.nan
+    ).clip(0, 120)
+    
+    def clasificar(v):
+        if pd.isna(v): return "N/D"
+        if v < 30: return "Baja"
+        if v < 60: return "Media"
+        if v < 80: return "Alta"
+        return "Crítica"
+    
+    out["nivel_criticidad"] = out["criticidad"].apply(clasificar)
+    return out
+
+
+def _window_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Suma de ``values[starts[i]:i+1]`` para cada i, vía suma acumulada."""
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    return csum[1:] - csum[starts]
+
+
+def hours_since_start(ts: pd.Series) -> np.ndarray:
+    """Eje de tiempo en horas desde el primer timestamp."""
+    if ts.empty:
+        return np.empty(0)
+    return ((ts - ts.iloc[0]).dt.total_seconds() / 3600.0).to_numpy(dtype=float)
+
+
+def row_window_starts(n: int, window: int) -> np.ndarray:
+    """Inicio (inclusive) de la ventana de ``window`` filas que termina en cada fila."""
+    return np.maximum(np.arange(n) - window + 1, 0)
+
+
+def time_window_starts(ts: pd.Series, window: pd.Timedelta) -> np.ndarray:
+    """Inicio de la ventana temporal ``(t - window, t]`` de cada fila (ts ordenado)."""
+    t = ts.to_numpy(dtype="datetime64[ns]")
+    return np.searchsorted(t, t - window.to_timedelta64(), side="right").astype(np.int64)
+
+
+def sampling_interval(ts: pd.Series) -> pd.Timedelta:
+    """Intervalo típico de muestreo (mediana de diferencias positivas)."""
+    dt = ts.diff().dropna()
+    dt = dt[dt > pd.Timedelta(0)]
+    return dt.median() if not dt.empty else pd.Timedelta(hours=1)
+
+
+def rolling_slope(y: np.ndarray, x: np.ndarray, window: int, min_periods: int,
+                  starts: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Pendiente de mínimos cuadrados en ventanas de ``window`` filas (o ``starts``
+    explícitos), en O(n).
+    
+    Se calcula en forma cerrada con sumas acumuladas de x, y, xy y x² sobre los
+    puntos válidos: los NaN se ignoran y la ventana necesita ``min_periods``
+    puntos válidos. ``x`` es el eje de tiempo, de modo que la pendiente queda
+    en unidades de y por unidad de x aunque falten filas.
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    n = len(y)
+    if n == 0:
+        return np.empty(0)
+    
+    valid = np.isfinite(y) & np.isfinite(x)
+    x0 = x[valid][0] if valid.any() else 0.0
+    xv = np.where(valid, x - x0, 0.0)
+    yv = np.where(valid, y, 0.0)
+    if starts is None:
+        starts = row_window_starts(n, window)
+    
+    k = _window_sum(valid.astype(float), starts)
+    sx, sy = _window_sum(xv, starts), _window_sum(yv, starts)
+    sxy, sxx = _window_sum(xv * yv, starts), _window_sum(xv * xv, starts)
+    
+    den = k * sxx - sx * sx
+    ok = (k >= max(min_periods, 2)) & (den > 0)
+    slope = np.full(n, np.nan)
+    slope[ok] = (k[ok] * sxy[ok] - sx[ok] * sy[ok]) / den[ok]
+    return slope
+
+
+class WindowStartsIndexer(BaseIndexer):
+    """Ventanas ``[starts[i], i]`` con inicio explícito por fila (filas o tiempo)."""
+    
+    def get_window_bounds(self, num_values: int = 0, min_periods: Optional[int] = None,
+                          center: Optional[bool] = None, closed: Optional[str] = None,
+                          step: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        starts = np.asarray(self.starts, dtype=np.int64)[:num_values]
+        return starts, np.arange(1, num_values + 1, dtype=np.int64)
+
+
+def rolling_quantile(values: np.ndarray, window: int, q: float, min_periods: int = 1,
+                     starts: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Cuantil móvil exacto sobre ventanas de ``window`` filas (o ``starts`` explícitos).
+    
+    Usa la ventana ordenada (skiplist, O(log w) por fila) de pandas a través de
+    un indexer con límites explícitos, por lo que sirve igual para ventanas
+    irregulares. NaN se ignoran; interpolación lineal.
+    """
+    values = np.asarray(values, dtype=float)
+    if starts is None:
+        starts = row_window_starts(len(values), window)
+    indexer = WindowStartsIndexer(window_size=int(window), starts=starts)
+    return pd.Series(values).rolling(indexer, min_periods=max(min_periods, 1)).quantile(q).to_numpy()
+
+
+ROLLING_CHUNK = pd.Timedelta(days=90)
+
+
+def _segment_window_stats(seg: pd.DataFrame, ts_col: str, span: pd.Timedelta, expected: int,
+                          min_p: int) -> pd.DataFrame:
+    """Estadísticas móviles de un tramo contiguo (ver ``rolling_window_stats``)."""
+    starts = time_window_starts(seg[ts_col], span)
+    indexer = WindowStartsIndexer(window_size=expected, starts=starts)
+    roll = seg[["T_a_out", "Rf_x1e4", "U_Wm2K"]].astype(float).rolling(indexer, min_periods=min_p)
+    means = roll.mean()
+    
+    stats = pd.DataFrame(index=seg.index)
+    stats["T_out_ma"] = means["T_a_out"]
+    stats["Rf_ma"] = means["Rf_x1e4"]
+    stats["U_ma"] = means["U_Wm2K"]
+    stats["T_out_p95_7d"] = rolling_quantile(seg["T_a_out"].to_numpy(dtype=float), expected, 0.95, min_p, starts)
+    stats["n_window"] = _window_sum(seg["T_a_out"].notna().to_numpy(dtype=float), starts)
+    
+    # Pendiente por hora (eje de tiempo real), ignorando NaN
+    stats["Rf_slope"] = rolling_slope(seg["Rf_x1e4"].to_numpy(dtype=float), hours_since_start(seg[ts_col]),
+                                      expected, min_p, starts)
+    return stats
+
+
+def rolling_window_stats(df: pd.DataFrame, ts_col: str, window: str = "7D",
+                         min_coverage: float = 0.25, interval: Optional[pd.Timedelta] = None) -> pd.DataFrame:
+    """
+    Estadísticas móviles por ventana de tiempo ``(t - window, t]``.
+    
+    Los inicios de ventana se calculan con ``searchsorted`` sobre ``ts_col`` y
+    se reutilizan para medias, conteos, P95 de T salida y pendiente de Rf, de
+    modo que la ventana cubre siempre el mismo tiempo aunque el muestreo sea
+    irregular o falten filas. Se exige ``min_coverage`` de las muestras
+    esperadas según el intervalo típico del historian (``interval``, o la
+    mediana de ``df`` si no se indica).
+    
+    La serie (ordenada) se procesa en tramos alineados a ``ROLLING_CHUNK``
+    desde epoch, cada uno con su ventana previa. Así el valor de cada fila solo
+    depende de su tramo: agregar filas al final deja iguales, bit a bit, las
+    filas de tramos anteriores, y las sumas acumuladas de la pendiente no
+    arrastran error de redondeo de toda la historia.
+    """
+    span = pd.Timedelta(window)
+    interval = interval if interval is not None else sampling_interval(df[ts_col])
+    expected = max(int(span / interval), 1)
+    min_p = max(2, int(expected * min_coverage))
+    
+    t = df[ts_col].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    if len(t) == 0:
+        return _segment_window_stats(df, ts_col, span, expected, min_p)
+    chunk = t // ROLLING_CHUNK.value
+    bounds = np.r_[np.flatnonzero(np.r_[True, chunk[1:] != chunk[:-1]]), len(t)]
+    
+    pieces = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        lo = int(np.searchsorted(t, chunk[a] * ROLLING_CHUNK.value - span.value, side="right"))
+        pieces.append(_segment_window_stats(df.iloc[lo:b], ts_col, span, expected, min_p).iloc[a - lo:])
+    return pd.concat(pieces)
+
+
+@instrumented()
+def add_rolling_features(df_op: pd.DataFrame, ts_col: str, window_days: int = 7, enf_key: str = None,
+                         interval: Optional[pd.Timedelta] = None) -> pd.DataFrame:
+    """Agrega features rolling (ventana de ``window_days`` días de tiempo real)."""
+    out = df_op.copy().sort_values(ts_col)
+    if out.empty:
+        return out
+    
+    stats = rolling_window_stats(out, ts_col, f"{max(int(window_days), 1)}D", interval=interval)
+    for col in stats.columns:
+        out[col] = stats[col]
+    
+    out["Rf_days_to_crit_est"] = np.nan
+    if enf_key and enf_key in DESIGN_PARAMS:
+        Rf_crit = DESIGN_PARAMS[enf_key]["fouling_design_m2KW"] * 1e4 * 5
+        mask = out["Rf_slope"].notna() & (out["Rf_slope"] > 1e-6) & out["Rf_ma"].notna()
+        over = out["Rf_ma"] >= Rf_crit
+        out.loc[over, "Rf_days_to_crit_est"] = 0.0
+        mask = mask & (~over)
+        # Rf_slope está en unidades por hora de tiempo real: a días con × 24
+        slope_per_day = out.loc[mask, "Rf_slope"] * 24.0
+        out.loc[mask, "Rf_days_to_crit_est"] = ((Rf_crit - out.loc[mask, "Rf_ma"]) / slope_per_day).clip(0, 365)
+    
+    return out
+
+
+# ===========================================
+# PIRÁMIDE DE AGREGADOS
+# ===========================================
+PYRAMID_COLS = ["T_a_in", "T_a_out", "U_Wm2K", "Rf_x1e4", "Q_used_W", "criticidad"]
+SKETCH_BINS = 256
+SKETCH_TAIL_Q = 0.001        # colas del sketch: fuera de P0.1–P99.9, una clase a cada lado...
+SKETCH_FENCE = 0.5           # ...y a lo más P1/P99 ± 0.5 × (P99 - P1), por si los picos superan el 0.1 %
+SKETCH_EXACT_ROWS = 2_000    # ventanas de hasta ~una semana horaria: recorrer las filas cuesta lo que combinar buckets
+_HOUR_NS = 3600 * 10**9
+_DAY_NS = 24 * _HOUR_NS
+_WEEK_NS = 7 * _DAY_NS
+
+
+@dataclass(frozen=True)
+class PyramidLevel:
+    """Agregados de un nivel de la pirámide (solo buckets con datos)."""
+    freq: str
+    start: np.ndarray                     # inicio de cada bucket (datetime64[ns])
+    count: Dict[str, np.ndarray]
+    total: Dict[str, np.ndarray]
+    vmin: Dict[str, np.ndarray]
+    vmax: Dict[str, np.ndarray]
+    hist: Dict[str, np.ndarray]           # sketch bucket × clase (vacío en nivel horario)
+
+
+@dataclass(frozen=True)
+class AggregatePyramid:
+    """
+    Agregados horarios, diarios y semanales de un enfriador en operación.
+    
+    Media, máximo, mínimo y conteo son exactos y se combinan sumando; los
+    cuantiles salen de histogramas de ``SKETCH_BINS`` clases fijas por variable,
+    que también se combinan sumando (error ≤ una clase central). Las clases
+    centrales cubren P0.1–P99.9 (acotado por ``SKETCH_FENCE``) y los extremos
+    van a dos clases de cola, así los picos no las ensanchan. Se guardan además las series crudas para
+    completar los bordes de ventanas no alineadas y para las ventanas cortas.
+    """
+    ts_col: str
+    ts: np.ndarray
+    values: Dict[str, np.ndarray]
+    edges: Dict[str, np.ndarray]
+    levels: Dict[str, PyramidLevel]
+
+
+def _group_starts(keys: np.ndarray) -> np.ndarray:
+    """Posición inicial de cada grupo de claves consecutivas iguales."""
+    if len(keys) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def _sketch_edges(values: np.ndarray, bins: int) -> np.ndarray:
+    """
+    Clases fijas del sketch: ``bins - 2`` uniformes en el rango central
+    (cuantiles ``SKETCH_TAIL_Q`` y ``1 - SKETCH_TAIL_Q``, acotados por la
+    cerca ``SKETCH_FENCE``), más una de cola a cada lado hasta el mínimo y
+    máximo observados.
+    """
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return np.linspace(0.0, 1.0, bins + 1)
+    q_lo, p1, p99, q_hi = np.quantile(finite, [SKETCH_TAIL_Q, 0.01, 0.99, 1 - SKETCH_TAIL_Q])
+    fence = SKETCH_FENCE * (p99 - p1)
+    lo, hi = float(max(q_lo, p1 - fence)), float(min(q_hi, p99 + fence))
+    if hi <= lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.r_[min(float(finite.min()), lo), np.linspace(lo, hi, bins - 1), max(float(finite.max()), hi)]
+
+
+def _sketch_bins(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Clase de cada valor (-1 para NaN)."""
+    bins = len(edges) - 1
+    out = np.full(len(values), -1, dtype=np.int64)
+    ok = np.isfinite(values)
+    out[ok] = np.clip(np.searchsorted(edges, values[ok], side="right") - 1, 0, bins - 1)
+    return out
+
+
+def _reduce_groups(v: np.ndarray, cuts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Conteo, suma, mínimo y máximo por grupo contiguo, ignorando NaN."""
+    ok = np.isfinite(v)
+    count = np.add.reduceat(ok.astype(np.int64), cuts)
+    total = np.add.reduceat(np.where(ok, v, 0.0), cuts)
+    vmin = np.minimum.reduceat(np.where(ok, v, np.inf), cuts)
+    vmax = np.maximum.reduceat(np.where(ok, v, -np.inf), cuts)
+    empty = count == 0
+    vmin[empty], vmax[empty] = np.nan, np.nan
+    return count, total, vmin, vmax
+
+
+def _raw_level(freq: str, step: int, t_int: np.ndarray, values: Dict[str, np.ndarray],
+               bins: Optional[Dict[str, np.ndarray]], nbins: int) -> PyramidLevel:
+    """Nivel calculado desde las filas crudas (ordenadas por tiempo)."""
+    keys = (t_int // step) * step
+    cuts = _group_starts(keys)
+    gid = np.cumsum(np.r_[False, keys[1:] != keys[:-1]]) if len(keys) else keys
+    count, total, vmin, vmax, hist = {}, {}, {}, {}, {}
+    for col, v in values.items():
+        count[col], total[col], vmin[col], vmax[col] = _reduce_groups(v, cuts)
+        if bins is not None:
+            b = bins[col]
+            ok = b >= 0
+            flat = np.bincount(gid[ok] * nbins + b[ok], minlength=len(cuts) * nbins)
+            hist[col] = flat.reshape(len(cuts), nbins).astype(np.int32)
+    return PyramidLevel(freq, keys[cuts].astype("datetime64[ns]"), count, total, vmin, vmax, hist)
+
+
+def _merge_level(freq: str, step: int, fine: PyramidLevel) -> PyramidLevel:
+    """Nivel más grueso combinando buckets de un nivel fino (exacto)."""
+    keys = (fine.start.astype(np.int64) // step) * step
+    cuts = _group_starts(keys)
+    count = {c: np.add.reduceat(a, cuts) for c, a in fine.count.items()}
+    total = {c: np.add.reduceat(a, cuts) for c, a in fine.total.items()}
+    vmin = {c: np.fmin.reduceat(a, cuts) for c, a in fine.vmin.items()}
+    vmax = {c: np.fmax.reduceat(a, cuts) for c, a in fine.vmax.items()}
+    hist = {c: np.add.reduceat(a, cuts, axis=0) for c, a in fine.hist.items()}
+    return PyramidLevel(freq, keys[cuts].astype("datetime64[ns]"), count, total, vmin, vmax, hist)
+
+
+def build_pyramid(df_op: pd.DataFrame, ts_col: str, cols: Sequence[str] = PYRAMID_COLS,
+                  bins: int = SKETCH_BINS) -> AggregatePyramid:
+    """Materializa la pirámide hora/día/semana de las filas en operación."""
+    d = df_op.dropna(subset=[ts_col])
+    if not d[ts_col].is_monotonic_increasing:
+        d = d.sort_values(ts_col)
+    ts = d[ts_col].to_numpy(dtype="datetime64[ns]")
+    t_int = ts.astype(np.int64)
+    values = {c: d[c].to_numpy(dtype=float) for c in cols if c in d.columns}
+    edges = {c: _sketch_edges(v, bins) for c, v in values.items()}
+    sketch = {c: _sketch_bins(v, edges[c]) for c, v in values.items()}
+    
+    hour = _raw_level("1h", _HOUR_NS, t_int, values, None, bins)
+    day = _raw_level("1D", _DAY_NS, t_int, values, sketch, bins)
+    week = _merge_level("7D", _WEEK_NS, day)
+    return AggregatePyramid(ts_col, ts, values, edges, {"hora": hour, "dia": day, "semana": week})
+
+
+@instrumented()
+def build_pyramids(all_op: Dict[str, pd.DataFrame], ts_col: str) -> Dict[str, AggregatePyramid]:
+    """Pirámide por enfriador."""
+    return {k: build_pyramid(df, ts_col) for k, df in all_op.items() if df is not None and not df.empty}
+
+
+def sketch_quantile(hist: np.ndarray, edges: np.ndarray, q: float,
+                    vmin: float = -np.inf, vmax: float = np.inf) -> float:
+    """Cuantil (interpolación lineal, como pandas) estimado desde un histograma."""
+    n = int(hist.sum())
+    if n == 0:
+        return np.nan
+    # Las clases de cola se acotan al mínimo/máximo de la ventana
+    edges = edges.copy()
+    edges[0] = min(max(edges[0], vmin), edges[1])
+    edges[-1] = max(min(edges[-1], vmax), edges[-2])
+    rank = q * (n - 1)
+    cum = np.cumsum(hist)
+    
+    def order_stat(k: int) -> float:
+        # k-ésimo valor ordenado, suponiendo valores repartidos dentro de la clase
+        b = int(np.searchsorted(cum, k, side="right"))
+        before = cum[b - 1] if b > 0 else 0
+        return edges[b] + (k - before + 0.5) / hist[b] * (edges[b + 1] - edges[b])
+    
+    lo = int(np.floor(rank))
+    hi = min(lo + 1, n - 1)
+    value = order_stat(lo) + (order_stat(hi) - order_stat(lo)) * (rank - lo)
+    return float(np.clip(value, vmin, vmax))
+
+
+def pyramid_aggregate(pyr: AggregatePyramid, start, stop, q: float = 0.95) -> Dict[str, Dict[str, float]]:
+    """
+    Agregados de ``[start, stop)`` por variable: count, mean, min, max y cuantil ``q``.
+    
+    Las semanas completas salen del nivel semanal, los días completos restantes
+    del diario y los bordes parciales de las filas crudas. Las ventanas de hasta
+    ``SKETCH_EXACT_ROWS`` filas se calculan directo de las filas crudas (cuantil
+    exacto).
+    """
+    t0 = pd.Timestamp(start).to_datetime64().astype("datetime64[ns]").astype(np.int64)
+    t1 = pd.Timestamp(stop).to_datetime64().astype("datetime64[ns]").astype(np.int64)
+    d0, d1 = -(-t0 // _DAY_NS) * _DAY_NS, (t1 // _DAY_NS) * _DAY_NS
+    if d1 <= d0:
+        d0 = d1 = t1
+    w0, w1 = -(-d0 // _WEEK_NS) * _WEEK_NS, (d1 // _WEEK_NS) * _WEEK_NS
+    if w1 <= w0:
+        w0 = w1 = d1
+    
+    t_int = pyr.ts.astype(np.int64)
+    lo, hi = np.searchsorted(t_int, [t0, t1])
+    if hi - lo <= SKETCH_EXACT_ROWS:
+        out = {}
+        for col, values in pyr.values.items():
+            v = values[lo:hi]
+            v = v[np.isfinite(v)]
+            out[col] = ({"count": len(v), "mean": float(v.mean()), "min": float(v.min()), "max": float(v.max()),
+                         "q": float(np.quantile(v, q))} if len(v) else
+                        {"count": 0, "mean": np.nan, "min": np.nan, "max": np.nan, "q": np.nan})
+        return out
+    
+    raw = [slice(*np.searchsorted(t_int, [t0, d0])), slice(*np.searchsorted(t_int, [d1, t1]))]
+    day, week = pyr.levels["dia"], pyr.levels["semana"]
+    day_int, week_int = day.start.astype(np.int64), week.start.astype(np.int64)
+    days = [slice(*np.searchsorted(day_int, [d0, w0])), slice(*np.searchsorted(day_int, [w1, d1]))]
+    weeks = [slice(*np.searchsorted(week_int, [w0, w1]))]
+    
+    out = {}
+    for col, edges in pyr.edges.items():
+        nbins = len(edges) - 1
+        hist = np.zeros(nbins, dtype=np.int64)
+        count, total, vmin, vmax = 0, 0.0, np.inf, -np.inf
+        for level, parts in ((day, days), (week, weeks)):
+            for sl in parts:
+                count += int(level.count[col][sl].sum())
+                total += float(level.total[col][sl].sum())
+                vmin = np.fmin(vmin, np.nanmin(level.vmin[col][sl], initial=np.inf))
+                vmax = np.fmax(vmax, np.nanmax(level.vmax[col][sl], initial=-np.inf))
+                hist += level.hist[col][sl].sum(axis=0)
+        for sl in raw:
+            v = pyr.values[col][sl]
+            v = v[np.isfinite(v)]
+            if len(v):
+                count += len(v)
+                total += float(v.sum())
+                vmin, vmax = min(vmin, float(v.min())), max(vmax, float(v.max()))
+                hist += np.bincount(_sketch_bins(v, edges), minlength=nbins)
+        if count == 0:
+            out[col] = {"count": 0, "mean": np.nan, "min": np.nan, "max": np.nan, "q": np.nan}
+            continue
+        out[col] = {"count": count, "mean": total / count, "min": float(vmin), "max": float(vmax),
+                    "q": sketch_quantile(hist, edges, q, vmin, vmax)}
+    return out
+
+
+def pyramid_frame(pyr: AggregatePyramid, start, stop, max_points: int) -> pd.DataFrame:
+    """
+    Serie de medias de ``[start, stop)`` desde el nivel más fino con ≤ ``max_points``
+    puntos (crudo, hora, día o semana) para gráficos de horizonte largo.
+    """
+    t0 = pd.Timestamp(start).to_datetime64().astype("datetime64[ns]")
+    t1 = pd.Timestamp(stop).to_datetime64().astype("datetime64[ns]")
+    lo, hi = np.searchsorted(pyr.ts, [t0, t1])
+    if hi - lo <= max_points:
+        return pd.DataFrame({pyr.ts_col: pyr.ts[lo:hi], **{c: v[lo:hi] for c, v in pyr.values.items()}})
+    
+    for name in ("hora", "dia", "semana"):
+        level = pyr.levels[name]
+        lo, hi = np.searchsorted(level.start, [t0, t1])
+        if hi - lo <= max_points or name == "semana":
+            break
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = {c: level.total[c][lo:hi] / level.count[c][lo:hi] for c in pyr.values}
+    return pd.DataFrame({pyr.ts_col: level.start[lo:hi], **means})
+
+
+# ===========================================
+# ESTADÍSTICAS DE VENTANA
+# ===========================================
+def window_stats(df_op: pd.DataFrame, dsg: dict, pyramid: Optional[AggregatePyramid] = None) -> Dict[str, float]:
+    """
+    Calcula estadísticas de una ventana de datos.
+    
+    Con ``pyramid`` (del mismo enfriador) medias, P95 y máximos se leen de los
+    agregados del rango de tiempo de ``df_op`` en vez de recorrer las filas;
+    ``df_op`` debe ser entonces el conjunto completo de filas en operación de
+    ese rango.
+    """
+    if df_op is None or df_op.empty:
+        return {}
+    
+    agg = {}
+    if pyramid is not None and pyramid.ts_col in df_op:
+        ts = df_op[pyramid.ts_col]
+        agg = pyramid_aggregate(pyramid, ts.min(), ts.max() + pd.Timedelta(1, "ns"))
+    
+    def mean(col: str) -> float:
+        return agg[col]["mean"] if col in agg else float(df_op[col].mean())
+    
+    def p95(col: str) -> float:
+        return agg[col]["q"] if col in agg else float(df_op[col].quantile(0.95))
+    
+    def vmax(col: str) -> float:
+        return agg[col]["max"] if col in agg else float(df_op[col].max())
+    
+    stats = {}
+    
+    if "T_a_out" in df_op:
+        stats["T_out_mean"] = mean("T_a_out")
+        stats["T_out_p95"] = p95("T_a_out")
+        stats["T_out_max"] = vmax("T_a_out")
+        stats["T_out_last"] = float(df_op["T_a_out"].iloc[-1])
+    
+    if "U_Wm2K" in df_op:
+        stats["U_mean"] = mean("U_Wm2K")
+        stats["U_last"] = float(df_op["U_Wm2K"].iloc[-1])
+        U_clean = float(dsg.get("U_clean_Wm2K", np.nan))
+        stats["U_clean"] = U_clean
+        stats["U_mean_pct"] = 100 * stats["U_mean"] / U_clean if U_clean > 0 else np.nan
+    
+    if "Rf_x1e4" in df_op:
+        stats["Rf_mean"] = mean("Rf_x1e4")
+        stats["Rf_p95"] = p95("Rf_x1e4")
+        stats["Rf_last"] = float(df_op["Rf_x1e4"].iloc[-1])
+    
+    if "Q_used_W" in df_op:
+        stats["Q_mean_MW"] = mean("Q_used_W") / 1e6
+        stats["Q_last_MW"] = float(df_op["Q_used_W"].iloc[-1] / 1e6)
+        Q_des = float(dsg.get("Q_design_W", np.nan)) / 1e6
+        stats["Q_design_MW"] = Q_des
+        stats["Q_mean_pct"] = 100 * stats["Q_mean_MW"] / Q_des if Q_des > 0 else np.nan
+    
+    if "criticidad" in df_op:
+        stats["crit_mean"] = mean("criticidad")
+        stats["crit_last"] = float(df_op["criticidad"].iloc[-1]) if pd.notna(df_op["criticidad"].iloc[-1]) else np.nan
+    
+    if "days_since_wash" in df_op:
+        last = df_op["days_since_wash"].iloc[-1]
+        stats["days_since_wash_last"] = float(last) if pd.notna(last) else np.nan
+    
+    return stats
+
+
+# ===========================================
+# INTERPRETACIONES
+# ===========================================
+def get_thermal_interpretation(df_op: pd.DataFrame, enf_key: str) -> Dict[str, Any]:
+    """Genera interpretación térmica."""
+    dsg = DESIGN_PARAMS.get(enf_key, {})
+    if df_op is None or df_op.empty:
+        return {"status": "error", "items": ["Sin datos en operación."]}
+    
+    stt = window_stats(df_op, dsg)
+    T_limit = float(dsg.get("T_acid_out_limit", 85))
+    items = []
+    status = "normal"
+    
+    Tp = stt.get("T_out_p95", np.nan)
+    Tm = stt.get("T_out_mean", np.nan)
+    
+    if pd.notna(Tp):
+        if Tp >= T_limit:
+            items.append(f"⚠️ **ALERTA**: P95 T salida = **{Tp:.1f}°C** excede límite **{T_limit:.0f}°C**.")
+            items.append("➡️ Acción: priorizar revisión y evaluar limpieza.")
+            status = "critical"
+        elif Tp >= 0.97 * T_limit:
+            items.append(f"🟡 P95 T salida = **{Tp:.1f}°C** cercana al límite.")
+            status = "warning"
+        else:
+            items.append(f"✅ T salida promedio = **{Tm:.1f}°C**, P95 = **{Tp:.1f}°C** (OK).")
+    
+    Qm = stt.get("Q_mean_MW", np.nan)
+    Qp = stt.get("Q_mean_pct", np.nan)
+    if pd.notna(Qm) and pd.notna(Qp):
+        if Qp > 120:
+            items.append(f"📈 Carga térmica alta: **{Qm:.2f} MW** ({Qp:.0f}% diseño).")
+        elif Qp < 50:
+            items.append(f"📉 Carga térmica baja: **{Qm:.2f} MW** ({Qp:.0f}% diseño).")
+        else:
+            items.append(f"✅ Carga térmica: **{Qm:.2f} MW** ({Qp:.0f}% diseño).")
+    
+    return {"status": status, "items": items}
+
+
+def get_fouling_interpretation(df_op: pd.DataFrame, enf_key: str) -> Dict[str, Any]:
+    """Genera interpretación de ensuciamiento."""
+    dsg = DESIGN_PARAMS.get(enf_key, {})
+    if df_op is None or df_op.empty:
+        return {"status": "error", "items": ["Sin datos en operación."]}
+    
+    stt = window_stats(df_op, dsg)
+    Rf_design = float(dsg.get("fouling_design_m2KW", 1.43e-4)) * 1e4
+    items = []
+    status = "normal"
+    
+    Rf_p = stt.get("Rf_p95", np.nan)
+    Rf_m = stt.get("Rf_mean", np.nan)
+    
+    if pd.notna(Rf_p):
+        if Rf_p >= 5 * Rf_design:
+            items.append(f"🔴 **CRÍTICO**: P95 Rf = **{Rf_p:.2f}×10⁻⁴** ≥ 5x diseño.")
+            items.append("➡️ Limpieza prioritaria.")
+            status = "critical"
+        elif Rf_p >= 3 * Rf_design:
+            items.append(f"🟠 **ALTO**: P95 Rf = **{Rf_p:.2f}×10⁻⁴** ≥ 3x diseño.")
+            items.append("➡️ Programar limpieza.")
+            status = "warning"
+        else:
+            items.append(f"✅ Rf promedio = **{Rf_m:.2f}×10⁻⁴**, P95 = **{Rf_p:.2f}×10⁻⁴** (OK).")
+    
+    U_m = stt.get("U_mean", np.nan)
+    U_pct = stt.get("U_mean_pct", np.nan)
+    if pd.notna(U_m) and pd.notna(U_pct):
+        if U_pct < 60:
+            items.append(f"⚠️ **U muy bajo**: {U_m:.0f} W/m²K ({U_pct:.0f}% limpio).")
+        elif U_pct < 80:
+            items.append(f"🟡 **U reducido**: {U_m:.0f} W/m²K ({U_pct:.0f}% limpio).")
+        else:
+            items.append(f"✅ U promedio: {U_m:.0f} W/m²K ({U_pct:.0f}% limpio).")
+    
+    return {"status": status, "items": items}
+
+
+def get_criticidad_interpretation(df_op: pd.DataFrame, enf_key: str) -> Dict[str, Any]:
+    """Genera interpretación de criticidad."""
+    if df_op is None or df_op.empty:
+        return {"status": "error", "items": ["Sin datos."], "recs": []}
+    
+    dsg = DESIGN_PARAMS.get(enf_key, {})
+    stt = window_stats(df_op, dsg)
+    crit_m = stt.get("crit_mean", np.nan)
+    days = stt.get("days_since_wash_last", np.nan)
+    
+    items, recs = [], []
+    
+    if pd.notna(crit_m):
+        if crit_m >= 80:
+            status = "critical"
+            items.append(f"🔴 **CRITICIDAD ALTA**: **{crit_m:.0f}/100**.")
+            recs = ["• Limpieza química en 48-72h", "• Revisar bypass/carga térmica", "• Incrementar flujo agua"]
+        elif crit_m >= 60:
+            status = "warning"
+            items.append(f"🟠 **CRITICIDAD MEDIA-ALTA**: **{crit_m:.0f}/100**.")
+            recs = ["• Planificar limpieza (1-2 semanas)", "• Monitorear tendencia diaria"]
+        elif crit_m >= 30:
+            status = "attention"
+            items.append(f"🟡 **CRITICIDAD MEDIA**: **{crit_m:.0f}/100**.")
+            recs = ["• Incluir en mantenimiento programado"]
+        else:
+            status = "normal"
+            items.append(f"🟢 **CRITICIDAD BAJA**: **{crit_m:.0f}/100**.")
+            recs = ["• Monitoreo rutinario"]
+    else:
+        status = "unknown"
+        items.append("⚪ Sin datos suficientes.")
+    
+    items.append(f"⏰ Días desde lavado: **{fmt(days, '{:.0f}', 'Sin registro')}**")
+    
+    return {"status": status, "items": items, "recs": recs}
+
+
+# ===========================================
+# SCORE OPERACIONAL Y DECISIÓN
+# ===========================================
+def rf_trend_to_critical(df_op: pd.DataFrame, enf_key: str, ts_col: str, lookback: int = 30) -> Tuple[Optional[float], Optional[float], str]:
+    """Calcula tendencia de Rf hacia crítico."""
+    if df_op is None or df_op.empty or "Rf_x1e4" not in df_op.columns:
+        return None, None, "sin_datos"
+    
+    dsg = DESIGN_PARAMS.get(enf_key, {})
+    Rf_crit = float(dsg.get("fouling_design_m2KW", 1.43e-4)) * 1e4 * 5
+    
+    d = df_op.dropna(subset=["Rf_x1e4", ts_col]).copy().sort_values(ts_col)
+    if d.empty:
+        return None, None, "sin_datos"
+    
+    cutoff = d[ts_col].max() - pd.Timedelta(days=lookback)
+    d = d[d[ts_col] >= cutoff]
+    if len(d) < 24:
+        return None, None, "pocos_datos"
+    
+    rf = d["Rf_x1e4"].values.astype(float)
+    slope, _ = np.polyfit(np.arange(len(rf)), rf, 1)
+    current = float(rf[-1])
+    
+    if slope <= 1e-6:
+        return float(slope), None, "estable"
+    if current >= Rf_crit:
+        return float(slope), 0.0, "empeora"
+    
+    days = max(0.0, (Rf_crit - current) / slope / 24)
+    return float(slope), float(days), "empeora"
+
+
+def operational_score(df_op: pd.DataFrame, enf_key: str, ts_col: str) -> Tuple[float, List[str]]:
+    """Calcula score operacional (0-1)."""
+    if df_op is None or df_op.empty:
+        return 0.0, ["Sin datos."]
+    
+    dsg = DESIGN_PARAMS.get(enf_key, {})
+    stt = window_stats(df_op, dsg)
+    
+    T_limit = float(dsg.get("T_acid_out_limit", 85))
+    Rf_design = float(dsg.get("fouling_design_m2KW", 1.43e-4)) * 1e4
+    Rf_crit = 5 * Rf_design
+    
+    T_p95 = stt.get("T_out_p95", np.nan)
+    Rf_p95 = stt.get("Rf_p95", np.nan)
+    crit_m = stt.get("crit_mean", np.nan)
+    
+    # Componentes 0-1
+    temp_s = float(np.clip((T_p95 - 0.95 * T_limit) / (0.05 * T_limit), 0, 1)) if pd.notna(T_p95) else 0
+    foul_s = float(np.clip((Rf_p95 - 1.2 * Rf_design) / (Rf_crit - 1.2 * Rf_design + 1e-9), 0, 1)) if pd.notna(Rf_p95) else 0
+    crit_s = float(np.clip((crit_m - 30) / 50, 0, 1)) if pd.notna(crit_m) else 0
+    
+    _, days_to_crit, _ = rf_trend_to_critical(df_op, enf_key, ts_col)
+    trend_s = float(np.clip((30 - days_to_crit) / 30, 0, 1)) if days_to_crit is not None else 0
+    
+    score = float(np.clip(0.35 * temp_s + 0.35 * foul_s + 0.20 * crit_s + 0.10 * trend_s, 0, 1))
+    
+    notes = [
+        f"T_p95: {fmt(T_p95, '{:.1f}')}°C / límite {T_limit:.0f}°C",
+        f"Rf_p95: {fmt(Rf_p95, '{:.2f}')}×10⁻⁴",
+        f"Criticidad: {fmt(crit_m, '{:.0f}')}/100",
+        f"Días a crítico: {fmt(days_to_crit, '{:.0f}', 'N/A')}"
+    ]
+    return score, notes
+
+
+@instrumented()
+def operational_score_history(df_op: pd.DataFrame, washes: pd.DataFrame, enf_key: str, ts_col: str,
+                              fallback: int = 30, freq: str = "D") -> pd.DataFrame:
+    """
+    ``operational_score`` al cierre de cada período con filas en operación,
+    sobre la misma ventana que usa el dashboard en ese momento: desde el
+    último lavado anterior o, si no hay, los últimos ``fallback`` días.
+    """
+    cols = [ts_col, "score_op"]
+    if df_op is None or df_op.empty:
+        return pd.DataFrame(columns=cols)
+    # Solo las columnas que entran al score: cada ventana se corta cientos de veces
+    d = df_op[[c for c in [ts_col, "T_a_out", "Rf_x1e4", "criticidad"] if c in df_op.columns]]
+    d = d.dropna(subset=[ts_col])
+    if not d[ts_col].is_monotonic_increasing:
+        d = d.sort_values(ts_col)
+    ts = d[ts_col].to_numpy(dtype="datetime64[ns]")
+    periods = pd.DatetimeIndex(ts).floor(freq).unique()
+    ends = (periods + pd.tseries.frequencies.to_offset(freq)).to_numpy(dtype="datetime64[ns]")
+    
+    w = washes[washes["enfriador_key"] == enf_key] if washes is not None and not washes.empty else None
+    wash_ts = (np.sort(pd.to_datetime(w["wash_ts"]).dropna().to_numpy(dtype="datetime64[ns]"))
+               if w is not None else np.empty(0, dtype="datetime64[ns]"))
+    
+    scores = []
+    for end in ends:
+        hi = int(np.searchsorted(ts, end))
+        k = int(np.searchsorted(wash_ts, end))
+        start = wash_ts[k - 1] if k else ts[hi - 1] - np.timedelta64(fallback, "D")
+        lo = int(np.searchsorted(ts, start))
+        scores.append(operational_score(d.iloc[lo:hi], enf_key, ts_col)[0])
+    return pd.DataFrame({ts_col: periods, "score_op": scores})
+
+
+def requires_wash(df_op: pd.DataFrame, enf_key: str, ts_col: str,
+                  pyramid: Optional[AggregatePyramid] = None) -> Tuple[bool, str]:
+    """Determina si requiere lavado."""
+    if df_op is None or df_op.empty:
+        return False, "Sin datos."
+    
+    dsg = DESIGN_PARAMS.get(enf_key, {})
+    stt = window_stats(df_op, dsg, pyramid)
+    
+    T_limit = float(dsg.get("T_acid_out_limit", 85))
+    Rf_crit = float(dsg.get("fouling_design_m2KW", 1.43e-4)) * 1e4 * 5
+    
+    triggers = []
+    if pd.notna(stt.get("T_out_p95")) and stt["T_out_p95"] >= T_limit:
+        triggers.append("P95 T excede límite")
+    if pd.notna(stt.get("Rf_p95")) and stt["Rf_p95"] >= Rf_crit:
+        triggers.append("P95 Rf ≥ crítico")
+    
+    _, days, _ = rf_trend_to_critical(df_op, enf_key, ts_col)
+    if days is not None and days <= 14:
+        triggers.append("Tendencia Rf < 14d")
+    if pd.notna(stt.get("crit_mean")) and stt["crit_mean"] >= 80:
+        triggers.append("Criticidad ≥ 80")
+    
+    if triggers:
+        return True, " | ".join(triggers)
+    return False, "Sin gatillos críticos."
+
+
+# ===========================================
+# ML
+# ===========================================
+@instrumented()
+def build_event_label(df_op: pd.DataFrame, washes: pd.DataFrame, ts_col: str,
+                      horizon: Union[int, Sequence[int]] = 30) -> pd.DataFrame:
+    """Crea etiqueta de evento (lavado futuro en ``(ts, ts + horizonte]``).
+    
+    Con varios horizontes, ``y`` corresponde al primero y cada uno queda
+    además en ``y_{h}d`` para comparar variantes de etiqueta.
+    """
+    horizons = [int(horizon)] if np.isscalar(horizon) else [int(h) for h in horizon]
+    if df_op is None or df_op.empty:
+        return df_op.assign(y=np.nan)
+    
+    out = df_op.copy().sort_values(ts_col)
+    
+    wash_ts = pd.Series(dtype="datetime64[ns]")
+    if washes is not None and not washes.empty:
+        wash_ts = pd.to_datetime(washes["wash_ts"], errors="coerce").dropna()
+    w = np.sort(wash_ts.to_numpy(dtype="datetime64[ns]"))
+    ts = pd.to_datetime(out[ts_col]).to_numpy(dtype="datetime64[ns]")
+    valid = ~np.isnat(ts)
+    
+    # Primer lavado estrictamente posterior a cada timestamp
+    idx = np.searchsorted(w, ts, side="right")
+    has_next = valid & (idx < len(w))
+    next_wash = np.full(len(ts), np.datetime64("NaT"), dtype="datetime64[ns]")
+    next_wash[has_next] = w[idx[has_next]]
+    
+    for i, h in enumerate(horizons):
+        lab = np.zeros(len(ts), dtype=int)
+        lab[has_next] = next_wash[has_next] <= ts[has_next] + np.timedelta64(h, "D")
+        if i == 0:
+            out["y"] = lab
+        if len(horizons) > 1:
+            out[f"y_{h}d"] = lab
+    return out
+
+
+def get_ml_features(df: pd.DataFrame) -> List[str]:
+    """Obtiene lista de features para ML."""
+    base = ["T_out_ma", "T_out_p95_7d", "Rf_ma", "Rf_slope", "Rf_days_to_crit_est",
+            "U_ma", "Q_used_W", "LMTD_K", "dT_acid", "F_w", "eff_U_pct", 
+            "Rf_x1e4", "T_a_out", "days_since_wash"]
+    return [c for c in base if c in df.columns]
+
+
+@instrumented()
+def prep_ml_data(df: pd.DataFrame, features: List[str]) -> Tuple[pd.DataFrame, pd.Series]:
+    """Prepara datos para ML."""
+    d = df.copy()
+    if "days_since_wash" in d.columns:
+        d["days_since_wash"] = d["days_since_wash"].clip(lower=0, upper=365)
+    
+    X = d[features].replace([np.inf, -np.inf], np.nan)
+    y = d["y"]
+    
+    mask = X.notna().all(axis=1) & y.notna()
+    return X.loc[mask].copy(), y.loc[mask].astype(int).copy()
+
+
+def can_train(y: pd.Series, config: AppConfig) -> Tuple[bool, str]:
+    """Verifica si se puede entrenar."""
+    if y is None or len(y) == 0:
+        return False, "Sin datos."
+    
+    classes = sorted(list(y.dropna().unique()))
+    if len(classes) < 2:
+        return False, f"Solo una clase: {classes}."
+    
+    c = y.value_counts()
+    pos, neg = int(c.get(1, 0)), int(c.get(0, 0))
+    
+    if pos < config.MIN_POSITIVES or neg < config.MIN_NEGATIVES:
+        return False, f"Insuficientes (pos={pos}, neg={neg})."
+    if len(y) < config.MIN_TRAIN_ROWS:
+        return False, f"Insuficientes filas ({len(y)})."
+    
+    return True, "OK"
+
+
+@instrumented()
+def train_models(X: pd.DataFrame, y: pd.Series, choice: str = "AUTO", ts: Optional[Sequence] = None,
+                 wash_ts: Sequence = (), horizon_days: int = AppConfig.PRED_HORIZON_DAYS,
+                 progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+    """
+    Evalúa los candidatos con validación cruzada forward-chaining por ciclos
+    de lavado (``ml_cv``) y entrena el elegido con todos los datos.
+    
+    ``ts`` son los timestamps de las filas de ``X``; ``wash_ts`` los lavados
+    del enfriador. ``progress(fracción, mensaje)`` informa el avance.
+    """
+    cfg = AppConfig()
+    ok, msg = can_train(y, cfg)
+    if not ok:
+        return {"trainable": False, "reason": msg}
+    if ts is None:
+        raise ValueError("train_models requiere los timestamps de las filas (ts)")
+    
+    def cv_progress(done: int, total: int) -> None:
+        if progress is not None:
+            progress(0.85 * done / total, f"Validación cruzada {done}/{total}")
+    
+    cv = ml_cv.cross_validate(X, y, ts, wash_ts, horizon_days, ml_cv.CANDIDATES, cfg.CV_FOLDS, cfg.CV_WORKERS,
+                              progress=cv_progress)
+    summary = cv["summary"]
+    if summary["PR-AUC"].notna().sum() == 0:
+        return {"trainable": False, "reason": "Ningún fold con ambas clases en prueba."}
+    
+    df_res = summary.sort_values("PR-AUC", ascending=False, na_position="last").reset_index(drop=True)
+    if choice == "AUTO":
+        name = df_res.loc[0, "Modelo"]
+    else:
+        idx = int(choice.split()[-1]) - 1 if choice.split()[-1].isdigit() else 0
+        name = ml_cv.CANDIDATES[min(max(idx, 0), len(ml_cv.CANDIDATES) - 1)]
+    
+    if progress is not None:
+        progress(0.85, f"Entrenando {name} con todos los datos")
+    t0 = time.perf_counter()
+    scaler, model = ml_cv.fit_candidate(name, X.to_numpy(dtype=float), y.to_numpy(dtype=int))
+    row = summary[summary["Modelo"] == name].iloc[0]
+    best = {"name": name, "model": model, "scaler": scaler, "pr_auc": float(row["PR-AUC"]),
+            "roc_auc": float(row["ROC-AUC"]), "fit_s": time.perf_counter() - t0,
+            "mem_MB": float(row["Memoria pico (MB)"])}
+    return {"trainable": True, "best": best, "results": df_res, "cv_folds": cv["folds"],
+            "cv_wall_s": cv["wall_s"], "cv_workers": cv["workers"], "cv_by": cv["by"]}
+
+
+def wash_signature(wash_ts: Sequence) -> str:
+    """Hash de los lavados usados para etiquetar (cambia si llega un lavado nuevo)."""
+    w = pd.to_datetime(pd.Series(wash_ts, dtype=object), errors="coerce").dropna().sort_values()
+    return hashlib.blake2b(w.astype(str).str.cat(sep="|").encode("utf-8"), digest_size=8).hexdigest()
+
+
+def update_online_pack(pack: Dict[str, Any], X: pd.DataFrame, y: pd.Series, ts: Sequence,
+                       wash_ts: Sequence, max_updates: int) -> Optional[Dict[str, Any]]:
+    """
+    Actualiza con ``partial_fit`` un pack cuyo mejor modelo es ONLINE usando
+    solo las filas posteriores a las ya entrenadas.
+    
+    Retorna None si no aplica (otro modelo, otras features, lavados nuevos
+    que re-etiquetan la historia, sin filas nuevas o demasiadas
+    actualizaciones seguidas): en ese caso corresponde reentrenar completo.
+    Los filtros y parámetros de diseño ya coinciden por la familia del pack
+    (``ModelKey.filter_hash``). Las métricas de validación (``results``)
+    quedan marcadas como ``cv_stale``: son del último entrenamiento completo
+    (``cv_trained_at``).
+    """
+    best = pack.get("best", {})
+    if (not pack.get("trainable") or best.get("name") not in ml_cv.ONLINE
+            or pack.get("features") != list(X.columns) or pack.get("wash_sig") != wash_signature(wash_ts)
+            or pack.get("online_updates", 0) >= max_updates or pack.get("ts_max") is None):
+        return None
+    ts = pd.to_datetime(pd.Series(np.asarray(ts), index=X.index))
+    new = (ts > pd.Timestamp(pack["ts_max"])).to_numpy()
+    if not new.any():
+        return None
+    
+    model = copy.deepcopy(best["model"])
+    _, fit_s, mem_mb = ml_cv.measure(ml_cv.update_candidate, best["name"], best["scaler"], model,
+                                     X.to_numpy(dtype=float)[new], y.to_numpy(dtype=int)[new])
+    return {**pack, "best": {**best, "model": model, "fit_s": fit_s, "mem_MB": mem_mb},
+            "ts_max": ts.max(), "n_rows": len(X), "online_updates": pack.get("online_updates", 0) + 1,
+            "updated_rows": int(new.sum()), "cv_stale": True,
+            "cv_trained_at": pack.get("cv_trained_at") or pack.get("trained_at", "")}
+
+
+def predict_proba_batch(pack: Dict, X: pd.DataFrame) -> np.ndarray:
+    """Probabilidad de lavado para todas las filas de ``X`` en una sola llamada."""
+    if X.empty:
+        return np.empty(0)
+    return ml_cv.predict_candidate(pack["best"]["scaler"], pack["best"]["model"], X.to_numpy(dtype=float))
+
+
+def predict_prob(pack: Dict, X: pd.DataFrame) -> float:
+    """Predice probabilidad con modelo entrenado."""
+    return float(predict_proba_batch(pack, X)[0])
+
+
+def model_version(pack: Dict) -> str:
+    """Identidad del modelo entrenado: cambia con cada entrenamiento o actualización online."""
+    key = pack.get("key", {})
+    return f"{key.get('data_hash', '')}/{pack.get('trained_at', '')}/{pack.get('online_updates', 0)}"
+
+
+@instrumented()
+def score_history(pack: Dict, df_ml: pd.DataFrame, features: List[str], ts_col: str,
+                  freq: Optional[str] = "D") -> pd.DataFrame:
+    """
+    Puntúa todas las filas operativas con features completas en una sola
+    llamada a ``predict_proba``. Con ``freq`` se resume por período
+    (media, máximo y cantidad de filas); sin ``freq`` retorna cada fila.
+    """
+    cols = [ts_col, "prob_ml", "prob_max", "n"]
+    if not pack.get("trainable") or df_ml.empty:
+        return pd.DataFrame(columns=cols)
+    rows = df_ml.dropna(subset=features)
+    if rows.empty:
+        return pd.DataFrame(columns=cols)
+    
+    scores = pd.DataFrame({ts_col: rows[ts_col].to_numpy(), "prob_ml": predict_proba_batch(pack, rows[features])})
+    if not freq:
+        return scores.assign(prob_max=scores["prob_ml"], n=1)
+    out = scores.resample(freq, on=ts_col)["prob_ml"].agg(["mean", "max", "count"])
+    out = out[out["count"] > 0].rename(columns={"mean": "prob_ml", "max": "prob_max", "count": "n"})
+    return out.reset_index()
+
+
+def model_importance(pack: Dict, features: List[str], top_n: int = 12) -> pd.DataFrame:
+    """Obtiene importancia de variables."""
+    if not pack.get("trainable"):
+        return pd.DataFrame(columns=["Variable", "Importancia"])
+    
+    model = pack["best"]["model"]
+    if hasattr(model, "feature_importances_"):
+        imp = model.feature_importances_
+    elif hasattr(model, "coef_"):
+        imp = np.abs(model.coef_[0])
+    else:
+        return pd.DataFrame(columns=["Variable", "Importancia"])
+    
+    df = pd.DataFrame({"Variable": features, "Importancia": imp})
+    df = df.sort_values("Importancia", ascending=False).head(top_n)
+    s = df["Importancia"].sum()
+    if s > 0:
+        df["Importancia"] = df["Importancia"] / s
+    return df
+
+
+# ===========================================
+# REGISTRO DE MODELOS
+# ===========================================
+MODEL_REGISTRY_VERSION = 3
+
+
+@dataclass(frozen=True)
+class ModelKey:
+    """Identidad de un pack entrenado: enfriador, features, datos, filtros, horizonte y modelo."""
+    enf_key: str
+    feature_hash: str
+    data_hash: str
+    filter_hash: str
+    horizon: int
+    choice: str
+    
+    @property
+    def family(self) -> str:
+        """
+        Carpeta común a todas las versiones de datos del mismo modelo. Incluye
+        ``filter_hash``: solo se reusan (o actualizan online) packs entrenados
+        con los mismos filtros de operación y parámetros de diseño.
+        """
+        choice = self.choice.replace(" ", "").lower()
+        return f"{self.enf_key}-h{self.horizon}-{choice}-{self.feature_hash}-{self.filter_hash}"
+    
+    @property
+    def filename(self) -> str:
+        return f"{self.data_hash}.joblib"
+
+
+def feature_hash(features: Sequence[str]) -> str:
+    """Hash corto de la lista (ordenada) de features."""
+    return hashlib.blake2b("|".join(features).encode("utf-8"), digest_size=6).hexdigest()
+
+
+def filter_hash(*parts: Any) -> str:
+    """Hash corto de lo que define las filas de entrenamiento sin la versión de datos (filtros, diseño)."""
+    raw = json.dumps(list(parts), sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def data_hash(*parts: Any) -> str:
+    """Hash corto de la versión de datos y de todo lo que cambia las filas de entrenamiento."""
+    raw = json.dumps([MODEL_REGISTRY_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def model_pack_path(model_dir: str, key: ModelKey) -> str:
+    return os.path.join(model_dir, key.family, key.filename)
+
+
+def load_model_pack(model_dir: str, key: ModelKey) -> Optional[Dict[str, Any]]:
+    """Pack guardado para ``key`` o None (inexistente o ilegible)."""
+    import joblib
+    
+    path = model_pack_path(model_dir, key)
+    try:
+        pack = joblib.load(path)
+    except (OSError, EOFError, ValueError, KeyError, ImportError, AttributeError):
+        return None
+    if not isinstance(pack, dict) or pack.get("registry_version") != MODEL_REGISTRY_VERSION:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return pack
+
+
+def save_model_pack(model_dir: str, key: ModelKey, pack: Dict[str, Any], keep: int = 3) -> str:
+    """
+    Guarda el pack (escritura atómica) y conserva solo las ``keep`` versiones
+    más recientes de la misma familia.
+    """
+    import joblib
+    
+    path = model_pack_path(model_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    joblib.dump(pack, tmp, compress=3)
+    os.replace(tmp, path)
+    
+    family_dir = os.path.dirname(path)
+    versions = sorted((e for e in os.scandir(family_dir) if e.name.endswith(".joblib")),
+                      key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in versions[max(keep, 1):]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return path
+
+
+@instrumented()
+def get_model_pack(X: pd.DataFrame, y: pd.Series, ts: Sequence, wash_ts: Sequence, key: ModelKey,
+                   model_dir: str, keep: int = 3, retrain: bool = False,
+                   progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+    """
+    Pack del registro para ``key``; entrena con ``train_models`` si no existe
+    o si se pide ``retrain``. Si la versión anterior de la familia es un
+    modelo ONLINE, solo se actualiza con las filas nuevas. En el pack quedan
+    ``features``, ``key``, ``trained_at``, ``train_seconds``,
+    ``online_updates`` y ``from_registry``.
+    """
+    if not retrain:
+        pack = load_model_pack(model_dir, key)
+        if pack is not None:
+            return {**pack, "from_registry": True}
+    
+    t0 = time.perf_counter()
+    prev = None if retrain else latest_model_pack(model_dir, key)
+    pack = (update_online_pack(prev, X, y, ts, wash_ts, AppConfig.ONLINE_MAX_UPDATES)
+            if prev is not None else None)
+    if pack is None:
+        pack = train_models(X, y, key.choice, ts, wash_ts, key.horizon, progress)
+        if not pack.get("trainable"):
+            return {**pack, "from_registry": False}
+        pack = {**pack, "ts_max": pd.to_datetime(pd.Series(np.asarray(ts))).max(), "n_rows": len(X),
+                "wash_sig": wash_signature(wash_ts), "online_updates": 0, "updated_rows": 0}
+    pack = {**pack, "registry_version": MODEL_REGISTRY_VERSION, "features": list(X.columns),
+            "key": asdict(key), "trained_at": datetime.now().isoformat(timespec="seconds"),
+            "train_seconds": time.perf_counter() - t0}
+    try:
+        save_model_pack(model_dir, key, pack, keep)
+    except OSError:
+        pass
+    return {**pack, "from_registry": False}
+
+
+def latest_model_pack(model_dir: str, key: ModelKey) -> Optional[Dict[str, Any]]:
+    """Pack más reciente de la familia de ``key`` (cualquier versión de datos) o None."""
+    family_dir = os.path.dirname(model_pack_path(model_dir, key))
+    try:
+        entries = sorted((e for e in os.scandir(family_dir) if e.name.endswith(".joblib")),
+                         key=lambda e: e.stat().st_mtime, reverse=True)
+    except OSError:
+        return None
+    for entry in entries:
+        pack = load_model_pack(model_dir, replace(key, data_hash=entry.name[:-len(".joblib")]))
+        if pack is not None:
+            return {**pack, "from_registry": True}
+    return None
+
+
+@dataclass
+class TrainingJob:
+    """
+    Estado de un entrenamiento en segundo plano (lo actualiza el worker).
+    ``status``: en cola, entrenando, listo, error o reemplazado (un job más
+    nuevo de la misma familia lo dejó obsoleto antes de empezar).
+    """
+    key: ModelKey
+    status: str = "en cola"
+    progress: float = 0.0
+    message: str = ""
+    submitted_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    
+    @property
+    def active(self) -> bool:
+        return self.status in ("en cola", "entrenando")
+    
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - (self.started_at if self.started_at is not None else self.submitted_at)
+
+
+class ModelTrainer:
+    """
+    Cola de entrenamientos en hilos de fondo, compartida entre sesiones.
+    
+    - ``submit`` encola un job por ``ModelKey``; si ya hay uno en curso para la
+      misma clave, retorna ese (los pedidos duplicados se fusionan).
+    - ``ready`` entrega el pack terminado para la clave (memoria o registro).
+    - ``latest`` entrega el último pack terminado de la familia mientras se
+      entrena la versión nueva.
+    - Un job nuevo reemplaza a los de la misma familia que siguen en cola
+      (versiones de datos ya superadas): no llegan a entrenarse.
+    - Se conservan a lo más ``max_jobs`` jobs; los terminados más antiguos se
+      descartan (``data_hash`` cambia con cada carga incremental).
+    """
+    
+    def __init__(self, max_workers: int = 1, max_packs: int = 16, max_jobs: int = 64):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cap3-train")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[ModelKey, TrainingJob]" = OrderedDict()
+        self._packs: "OrderedDict[ModelKey, Dict[str, Any]]" = OrderedDict()
+        self._max_packs = max_packs
+        self._max_jobs = max_jobs
+    
+    def _remember(self, key: ModelKey, pack: Dict[str, Any]) -> None:
+        with self._lock:
+            self._packs[key] = pack
+            self._packs.move_to_end(key)
+            while len(self._packs) > self._max_packs:
+                self._packs.popitem(last=False)
+    
+    def job(self, key: ModelKey) -> Optional[TrainingJob]:
+        with self._lock:
+            return self._jobs.get(key)
+    
+    def ready(self, key: ModelKey, model_dir: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            pack = self._packs.get(key)
+        if pack is None:
+            pack = load_model_pack(model_dir, key)
+            if pack is None:
+                return None
+            pack = {**pack, "from_registry": True}
+            self._remember(key, pack)
+        return pack
+    
+    def latest(self, key: ModelKey, model_dir: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            same_family = [p for k, p in reversed(self._packs.items())
+                           if k.family == key.family and p.get("trainable")]
+        return same_family[0] if same_family else latest_model_pack(model_dir, key)
+    
+    def submit(self, key: ModelKey, X: pd.DataFrame, y: pd.Series, ts: Sequence, wash_ts: Sequence,
+               model_dir: str, keep: int = 3, retrain: bool = False) -> TrainingJob:
+        """Encola el entrenamiento de ``key``; un job activo o fallido (sin ``retrain``) se reutiliza."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and (job.active or (job.status == "error" and not retrain)):
+                return job
+            now = time.time()
+            for other in self._jobs.values():
+                if other.key.family == key.family and other.status == "en cola":
+                    other.status, other.finished_at = "reemplazado", now
+            job = TrainingJob(key, submitted_at=now)
+            self._jobs.pop(key, None)
+            self._jobs[key] = job
+            done = [k for k, j in self._jobs.items() if not j.active]
+            for k in done[:max(len(self._jobs) - self._max_jobs, 0)]:
+                del self._jobs[k]
+        self._pool.submit(self._run, job, X, y, ts, wash_ts, model_dir, keep, retrain)
+        return job
+    
+    def _run(self, job: TrainingJob, X: pd.DataFrame, y: pd.Series, ts: Sequence, wash_ts: Sequence,
+             model_dir: str, keep: int, retrain: bool) -> None:
+        with self._lock:
+            if job.status != "en cola":
+                return  # reemplazado mientras esperaba
+            job.status, job.started_at = "entrenando", time.time()
+        
+        def progress(frac: float, message: str) -> None:
+            job.progress, job.message = min(max(frac, 0.0), 1.0), message
+        
+        try:
+            with PERF_LOG.run(f"entrenamiento {job.key.enf_key}", AppConfig.PERF_TRACE_MEMORY):
+                pack = get_model_pack(X, y, ts, wash_ts, job.key, model_dir, keep, retrain, progress)
+        except Exception as e:  # el worker no debe morir por un job
+            job.status, job.error = "error", f"{type(e).__name__}: {e}"
+        else:
+            self._remember(job.key, pack)
+            job.status, job.progress, job.message = "listo", 1.0, ""
+        finally:
+            job.finished_at = time.time()
+
+
+# ===========================================
+# SUBMUESTREO DE TENDENCIAS
+# ===========================================
+def _x_as_float(x: pd.Series) -> np.ndarray:
+    """Eje x numérico (ns para fechas) para calcular buckets."""
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+    return np.asarray(x, dtype=float)
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Índices de mínimo y máximo por bucket de ancho fijo en x (≈ un píxel).
+    
+    Conserva todos los picos visibles, el primer y último punto, y un NaN por
+    bucket con huecos para que los cortes sigan viéndose.
+    """
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    span = x[-1] - x[0]
+    b = np.zeros(n, dtype=np.int64) if span <= 0 else \
+        np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    
+    valid = np.isfinite(y)
+    vi = np.flatnonzero(valid)
+    order = vi[np.lexsort((y[vi], b[vi]))]
+    bo = b[order]
+    first = np.r_[True, bo[1:] != bo[:-1]]
+    last = np.r_[bo[1:] != bo[:-1], True]
+    
+    gaps = np.flatnonzero(~valid)
+    _, gap_first = np.unique(b[gaps], return_index=True)
+    keep = np.concatenate((order[first], order[last], gaps[gap_first], [0, n - 1]))
+    return np.unique(keep)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets sobre los puntos válidos (NaN se omiten)."""
+    vi = np.flatnonzero(np.isfinite(y))
+    if len(vi) <= n_out or n_out < 3:
+        return vi
+    xs, ys = x[vi], y[vi]
+    edges = np.linspace(1, len(vi) - 1, n_out - 1).astype(np.int64)
+    
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, len(vi) - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else len(vi)
+        cx, cy = xs[nxt_lo:nxt_hi].mean(), ys[nxt_lo:nxt_hi].mean()
+        area = np.abs((xs[a] - cx) * (ys[lo:hi] - ys[a]) - (xs[a] - xs[lo:hi]) * (cy - ys[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return vi[keep]
+
+
+def downsample_xy(x: pd.Series, y: pd.Series, max_points: int,
+                  method: str = AppConfig.CHART_DOWNSAMPLE) -> Tuple[pd.Series, pd.Series]:
+    """Reduce una serie a ~``max_points`` puntos antes de armar la traza."""
+    if max_points <= 0 or len(y) <= max_points:
+        return x, y
+    xf, yf = _x_as_float(x), np.asarray(y, dtype=float)
+    if method == "lttb":
+        idx = lttb_indices(xf, yf, max_points)
+    else:
+        idx = minmax_indices(xf, yf, max(max_points // 2, 1))
+    return x.iloc[idx], y.iloc[idx]
+
+
+# ===========================================
+# PIPELINE
+# ===========================================
+ROLLING_COLS = ["T_out_ma", "T_out_p95_7d", "Rf_ma", "Rf_slope", "U_ma", "Rf_days_to_crit_est", "n_window"]
+
+
+ROLLING_WINDOW_DAYS = 7
+
+
+def _cooler_row_stages(frame: pd.DataFrame, washes: pd.DataFrame, ts_col: str, enf_key: str,
+                       min_blower: float, min_flow_pct: float) -> pd.DataFrame:
+    """Etapas fila a fila: operación, modelo térmico, lavados y criticidad."""
+    df = filter_operation(frame, enf_key, min_blower, min_flow_pct)
+    df = apply_thermal_model(df, ts_col, enf_key)
+    df = add_wash_features(df, washes, ts_col, enf_key)
+    return calculate_criticidad(df, enf_key)
+
+
+def _merge_rolling(df: pd.DataFrame, df_op: pd.DataFrame, ts_col: str) -> pd.DataFrame:
+    """Lleva las columnas rolling de las filas en operación al DataFrame completo."""
+    roll_cols = [c for c in ROLLING_COLS if c in df_op.columns]
+    if not roll_cols:
+        return df
+    return df.merge(df_op[[ts_col] + roll_cols].drop_duplicates(ts_col), on=ts_col, how="left")
+
+
+@instrumented()
+def process_coolers(df_wide: pd.DataFrame, washes: pd.DataFrame, ts_col: str, min_blower: float = 50.0,
+                    min_flow_pct: float = 30.0) -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame], Dict[str, dict]]:
+    """
+    Ejecuta el pipeline completo para los tres enfriadores.
+    
+    Retorna ``(all_df, all_op, all_last)``: datos completos con features rolling,
+    filas en operación con features rolling y última fila en operación.
+    """
+    cooler_frames = build_cooler_frames(df_wide, ts_col)
+    all_df, all_op, all_last = {}, {}, {}
+    
+    for enf_key in ["TS", "TAI", "TAF"]:
+        df = _cooler_row_stages(cooler_frames[enf_key], washes, ts_col, enf_key, min_blower, min_flow_pct)
+        
+        df_op = df[df["en_operacion"] == 1].copy().sort_values(ts_col)
+        df_op = add_rolling_features(df_op, ts_col, ROLLING_WINDOW_DAYS, enf_key)
+        
+        all_df[enf_key] = _merge_rolling(df, df_op, ts_col)
+        all_op[enf_key] = df_op
+        if not df_op.empty:
+            all_last[enf_key] = df_op.iloc[-1].to_dict()
+    
+    return all_df, all_op, all_last
+
+
+@instrumented()
+def extend_coolers(all_df: Dict[str, pd.DataFrame], all_op: Dict[str, pd.DataFrame], df_new: pd.DataFrame,
+                   washes: pd.DataFrame, ts_col: str, min_blower: float = 50.0, min_flow_pct: float = 30.0,
+                   ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame], Dict[str, dict]]:
+    """
+    Extiende un resultado de ``process_coolers`` con filas nuevas del historian.
+    
+    ``df_new`` son solo las filas agregadas (posteriores a las ya procesadas,
+    con los mismos lavados y filtros). Las etapas fila a fila corren solo
+    sobre ellas. Las rolling recalculan desde el inicio del tramo
+    ``ROLLING_CHUNK`` de la primera fila nueva, con su ventana previa, y con
+    el intervalo de muestreo de la serie completa; el resultado es idéntico al
+    de ``process_coolers`` sobre todas las filas. No modifica los DataFrames
+    recibidos.
+    """
+    offset = len(next(iter(all_df.values()))) if all_df else 0
+    cooler_frames = build_cooler_frames(df_new, ts_col)
+    window = pd.Timedelta(days=ROLLING_WINDOW_DAYS)
+    out_df, out_op, out_last = {}, {}, {}
+    
+    for enf_key in ["TS", "TAI", "TAF"]:
+        frame = cooler_frames[enf_key]
+        frame.index = pd.RangeIndex(offset, offset + len(frame))
+        new = _cooler_row_stages(frame, washes, ts_col, enf_key, min_blower, min_flow_pct)
+        new_op = new[new["en_operacion"] == 1].copy().sort_values(ts_col)
+        prev_op = all_op.get(enf_key, pd.DataFrame())
+        prev_df = all_df.get(enf_key)
+        
+        if prev_op.empty or prev_df is None:
+            df_all = pd.concat([prev_df, new], ignore_index=True) if prev_df is not None else new
+            df_op = add_rolling_features(df_all[df_all["en_operacion"] == 1], ts_col, ROLLING_WINDOW_DAYS, enf_key)
+            df_all = _merge_rolling(df_all.drop(columns=ROLLING_COLS, errors="ignore"), df_op, ts_col)
+        elif new_op.empty:
+            df_op = prev_op
+            df_all = pd.concat([prev_df, _merge_rolling(new, new_op, ts_col)], ignore_index=True)
+        else:
+            interval = sampling_interval(pd.concat([prev_op[ts_col], new_op[ts_col]], ignore_index=True))
+            if interval != sampling_interval(prev_op[ts_col]):
+                # Cambió el intervalo típico (y con él min_periods): se recalculan todas las ventanas
+                df_op = add_rolling_features(pd.concat([prev_op, new_op]), ts_col, ROLLING_WINDOW_DAYS,
+                                             enf_key, interval=interval)
+                df_all = pd.concat([prev_df.drop(columns=ROLLING_COLS, errors="ignore"), new], ignore_index=True)
+                df_all = _merge_rolling(df_all, df_op, ts_col)
+            else:
+                # Tramo de ROLLING_CHUNK de la primera fila nueva, con su ventana previa
+                t0 = new_op[ts_col].iloc[0].value
+                anchor = pd.Timestamp((t0 // ROLLING_CHUNK.value) * ROLLING_CHUNK.value)
+                lookback = prev_op[prev_op[ts_col] > anchor - window]
+                seg = add_rolling_features(pd.concat([lookback, new_op]), ts_col, ROLLING_WINDOW_DAYS,
+                                           enf_key, interval=interval)
+                new_op = seg.iloc[len(lookback):]
+                df_op = pd.concat([prev_op, new_op])
+                df_all = pd.concat([prev_df, _merge_rolling(new, new_op, ts_col)], ignore_index=True)
+        
+        out_df[enf_key] = df_all
+        out_op[enf_key] = df_op
+        if not df_op.empty:
+            out_last[enf_key] = df_op.iloc[-1].to_dict()
+    
+    return out_df, out_op, out_last
+
+
+@dataclass(frozen=True)
+class PipelineState:
+    """Último resultado del pipeline y la versión de datos que lo produjo."""
+    data_version: str
+    rows: int
+    all_df: Dict[str, pd.DataFrame]
+    all_op: Dict[str, pd.DataFrame]
+    all_last: Dict[str, dict]
+    incremental: bool = False
+
+
+def params_fingerprint() -> str:
+    """Hash de tags, parámetros de diseño y propiedades (invalida cachés si cambian)."""
+    raw = json.dumps([ENGINEERING_MAP, DESIGN_PARAMS, ACID_PROPS, BLOWER_TAG], sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def file_version(path: str) -> str:
+    """Versión liviana de un archivo (ruta, tamaño y mtime)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ""
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# ===========================================
+# VENTANAS
+# ===========================================
+def get_last_wash_ts(washes: pd.DataFrame, enf_key: str) -> Optional[pd.Timestamp]:
+    """Obtiene timestamp del último lavado."""
+    if washes is None or washes.empty:
+        return None
+    w = washes[washes["enfriador_key"] == enf_key]
+    if w.empty:
+        return None
+    return pd.to_datetime(w["wash_ts"]).max()
+
+
+def get_window_start(df: pd.DataFrame, ts_col: str, washes: pd.DataFrame, enf_key: str, fallback: int = 30) -> Tuple[Optional[pd.Timestamp], bool]:
+    """Obtiene inicio de ventana."""
+    last = get_last_wash_ts(washes, enf_key)
+    if last:
+        return pd.Timestamp(last), True
+    if df.empty:
+        return None, False
+    return pd.Timestamp(df[ts_col].max() - pd.Timedelta(days=fallback)), False
+
+
+def compute_global_window(all_df: Dict[str, pd.DataFrame], ts_col: str, fallback: int = 30) -> int:
+    """Calcula ventana global."""
+    vals = []
+    for dfk in all_df.values():
+        if dfk is None or dfk.empty:
+            continue
+        dfop = dfk[dfk["en_operacion"] == 1]
+        if dfop.empty or "days_since_wash" not in dfop.columns:
+            continue
+        v = dfop.iloc[-1].get("days_since_wash", np.nan)
+        if pd.notna(v):
+            vals.append(float(v))
+    return int(np.clip(max(vals), 7, 365)) if vals else fallback
+
+
+# ===========================================
+# PDF PROFESIONAL
+# ===========================================
+@instrumented()
+def generate_pdf(all_df: Dict, washes: pd.DataFrame, ts_col: str, window_days: int, 
+                 model_choice: str, logo_path: str,
+                 pyramids: Optional[Dict[str, AggregatePyramid]] = None, data_version: str = "",
+                 fig_dir: Optional[str] = AppConfig.FIGURE_DIR,
+                 max_workers: Optional[int] = AppConfig.PDF_WORKERS,
+                 end: Optional[pd.Timestamp] = None) -> Optional[bytes]:
+    """
+    Genera reporte PDF profesional con gráficos e interpretaciones.
+    
+    Incluye:
+    - Resumen ejecutivo con recomendaciones
+    - Gráficos comparativos entre enfriadores
+    - Análisis detallado por enfriador con gráficos de tendencia
+    - Interpretaciones automáticas
+    - Timeline de lavados
+    
+    Con ``pyramids`` los KPIs y las tendencias largas se leen de la pirámide
+    de agregados. Las figuras se renderizan en paralelo (``pdf_figures``) y,
+    si se entrega ``data_version``, se reusan desde ``fig_dir`` cuando
+    enfriador, ventana y datos no cambiaron.
+    
+    Con ``end`` la ventana es ``[end - window_days, end]`` en lugar de
+    terminar en el último dato (reportes históricos); los enfriadores sin
+    operación en ese período se listan en la portada y, si ninguno tiene
+    datos, no se genera el reporte.
+    """
+    pyramids = pyramids or {}
+    if not PDF_AVAILABLE:
+        return None
+    
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        from reportlab.lib.units import cm
+        from reportlab.platypus import (
+            Image as RLImage,
+            PageBreak,
+            Paragraph,
+            SimpleDocTemplate,
+            Spacer,
+            Table,
+            TableStyle,
+        )
+    except ImportError:
+        return None
+    
+    # Colores corporativos
+    CORP = {
+        'primary': colors.HexColor("#0B2D5B"),
+        'secondary': colors.HexColor("#1E5AA8"),
+        'accent': colors.HexColor("#E67E22"),
+        'success': colors.HexColor("#27AE60"),
+        'warning': colors.HexColor("#F39C12"),
+        'danger': colors.HexColor("#E74C3C"),
+        'light_bg': colors.HexColor("#F8F9FA"),
+        'gray': colors.HexColor("#95A5A6"),
+    }
+    
+    # Estilos
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='MainTitle', fontSize=24, textColor=CORP['primary'],
+                              spaceAfter=6, alignment=1, fontName='Helvetica-Bold'))
+    styles.add(ParagraphStyle(name='Subtitle', fontSize=12, textColor=CORP['gray'],
+                              spaceAfter=20, alignment=1))
+    styles.add(ParagraphStyle(name='SectionHeader', fontSize=16, textColor=CORP['primary'],
+                              spaceBefore=20, spaceAfter=10, fontName='Helvetica-Bold'))
+    styles.add(ParagraphStyle(name='SubHeader', fontSize=13, textColor=CORP['secondary'],
+                              spaceBefore=14, spaceAfter=8, fontName='Helvetica-Bold'))
+    styles.add(ParagraphStyle(name='Body', fontSize=10, textColor=colors.HexColor("#2C3E50"),
+                              leading=14, spaceAfter=8))
+    styles.add(ParagraphStyle(name='Small', fontSize=8, textColor=CORP['gray'], leading=10))
+    styles.add(ParagraphStyle(name='Recommendation', fontSize=11, textColor=CORP['primary'],
+                              fontName='Helvetica-Bold', spaceBefore=10, spaceAfter=10,
+                              leftIndent=20, backColor=colors.HexColor("#FFF8E7")))
+    
+    def fig_to_img(png: bytes, width_cm=17.0):
+        """Convierte PNG renderizado a imagen reportlab."""
+        img = RLImage(io.BytesIO(png))
+        aspect = img.drawHeight / img.drawWidth
+        img.drawWidth = width_cm * cm
+        img.drawHeight = width_cm * cm * aspect
+        return img
+    
+    def get_crit_info(val):
+        if pd.isna(val): return "N/D", "⚪", CORP['gray']
+        if val >= 80: return "CRÍTICA", "🔴", CORP['danger']
+        if val >= 60: return "ALTA", "🟠", CORP['accent']
+        if val >= 30: return "MEDIA", "🟡", CORP['warning']
+        return "BAJA", "🟢", CORP['success']
+    
+    # === Preparar datos ===
+    summary_data = []
+    no_data = []
+    priority_enf = None
+    max_score = -1
+    
+    for enf_key in ['TS', 'TAI', 'TAF']:
+        df = all_df.get(enf_key, pd.DataFrame())
+        dsg = DESIGN_PARAMS.get(enf_key, {})
+        df_win = pd.DataFrame()
+        if not df.empty:
+            df = df.dropna(subset=[ts_col]).sort_values(ts_col)
+            if end is not None:
+                df = df[df[ts_col] <= end]
+            # Con ``end`` la ventana se ancla en esa fecha, no en el último dato anterior a ella
+            win_end = end if end is not None else df[ts_col].max()
+            win_start = win_end - pd.Timedelta(days=window_days)
+            df_win = df[(df[ts_col] >= win_start) & (df['en_operacion'] == 1)]
+        
+        if df_win.empty:
+            no_data.append(dsg.get('short_name', enf_key))
+            continue
+        
+        stt = window_stats(df_win, dsg, pyramids.get(enf_key))
+        T_mean = stt['T_out_mean']
+        T_p95 = stt['T_out_p95']
+        U_mean = stt['U_mean']
+        U_clean = float(dsg.get('U_clean_Wm2K', 1700))
+        U_pct = 100 * U_mean / U_clean if U_clean > 0 else 0
+        Rf_mean = stt['Rf_mean']
+        Rf_p95 = stt['Rf_p95']
+        Rf_design = float(dsg.get('fouling_design_m2KW', 1.43e-4)) * 1e4
+        Rf_crit = Rf_design * 5
+        Q_mean = stt['Q_mean_MW']
+        crit = stt.get('crit_mean', 0)
+        days_w = stt.get('days_since_wash_last', np.nan)
+        T_limit = float(dsg.get('T_acid_out_limit', 85))
+        
+        req_wash = (T_p95 >= T_limit) or (Rf_p95 >= Rf_crit) or (crit >= 80)
+        
+        data = {
+            'key': enf_key, 'name': dsg.get('short_name', enf_key),
+            'T_mean': T_mean, 'T_p95': T_p95, 'T_limit': T_limit,
+            'T_design': dsg.get('T_acid_out_design', 77),
+            'U_mean': U_mean, 'U_clean': U_clean, 'U_pct': U_pct,
+            'Rf_mean': Rf_mean, 'Rf_p95': Rf_p95, 'Rf_design': Rf_design, 'Rf_crit': Rf_crit,
+            'Q_mean': Q_mean, 'Q_design': dsg.get('Q_design_W', 1e7) / 1e6,
+            'criticidad': crit, 'days_wash': days_w, 'requires_wash': req_wash,
+            'df_win': df_win, 'dsg': dsg, 'win': (win_start, win_end + pd.Timedelta(1, 'ns'))
+        }
+        summary_data.append(data)
+        
+        score = (40 if T_p95 >= T_limit else 0) + (30 if Rf_p95 >= Rf_crit else 0) + (20 if crit >= 80 else 10 if crit >= 60 else 0)
+        if score > max_score:
+            max_score, priority_enf = score, data
+    
+    if end is not None and not summary_data:
+        return None  # período histórico sin operación en ningún enfriador
+    
+    # === Figuras (en paralelo, con caché por enfriador/ventana/datos) ===
+    fig_cols = [ts_col, 'T_a_in', 'T_a_out', 'Q_used_W', 'Rf_x1e4', 'U_Wm2K', 'criticidad']
+    fig_data_keys = ['name', 'T_limit', 'T_design', 'Q_design', 'Rf_design', 'Rf_crit', 'U_clean']
+    cacheable = bool(data_version)
+    comp_rows = [{k: d[k] for k in ['name', 'criticidad', 'T_p95', 'T_limit', 'Rf_p95', 'Rf_crit']}
+                 for d in summary_data]
+    jobs = [(pdf_figures.figure_key("comparativo", data_version, window_days, [d['win'] for d in summary_data])
+             if cacheable else None, "comparativo", (comp_rows,))]
+    for data in summary_data:
+        pyr = pyramids.get(data['key'])
+        if pyr is not None:
+            df = pyramid_frame(pyr, *data['win'], AppConfig.PDF_MAX_POINTS)
+        else:
+            df = data['df_win'].dropna(subset=[ts_col]).sort_values(ts_col)
+        df = df[[c for c in fig_cols if c in df.columns]].reset_index(drop=True)
+        fig_data = {k: data[k] for k in fig_data_keys}
+        for kind in ["termico", "ensuciamiento", "criticidad"]:
+            key = (pdf_figures.figure_key(kind, data['key'], data['win'], data_version, pyr is not None)
+                   if cacheable else None)
+            jobs.append((key, kind, (df, ts_col, fig_data)))
+    w_fig = None
+    if washes is not None and not washes.empty:
+        w_fig = washes[[c for c in ['wash_ts', 'enfriador_key'] if c in washes.columns]]
+    w_sig = (int(pd.util.hash_pandas_object(w_fig.astype(str), index=False).sum()) if w_fig is not None else 0)
+    jobs.append((pdf_figures.figure_key("lavados", w_sig), "lavados", (w_fig,)))
+    
+    pngs, _ = pdf_figures.render_figures(jobs, fig_dir, max_workers, AppConfig.FIGURE_CACHE_MAX)
+    png_comp, png_wash = pngs[0], pngs[-1]
+    png_cooler = [pngs[1 + 3 * i: 4 + 3 * i] for i in range(len(summary_data))]
+    
+    # === Construir PDF ===
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=1.8*cm, leftMargin=1.8*cm,
+                            topMargin=1.5*cm, bottomMargin=1.5*cm)
+    story = []
+    
+    # Logo
+    if logo_path and os.path.exists(logo_path):
+        try:
+            logo = RLImage(logo_path)
+            logo.drawHeight, logo.drawWidth = 1.5*cm, 5.0*cm
+            story.append(logo)
+            story.append(Spacer(1, 10))
+        except: pass
+    
+    # Título
+    story.append(Paragraph("Reporte Operacional", styles['MainTitle']))
+    story.append(Paragraph("Enfriadores de Ácido Sulfúrico - Planta CAP-3", styles['Subtitle']))
+    story.append(Spacer(1, 5))
+    
+    # Info
+    info_rows = [
+        ['Fecha:', datetime.now().strftime('%d/%m/%Y %H:%M')],
+        ['Ventana:', f'{window_days} días'],
+        ['Equipos:', 'Torre Secado, Torre Interpaso, Torre Final']
+    ]
+    if end is not None:
+        p_start = (end - pd.Timedelta(days=window_days)).ceil('D')
+        info_rows.insert(2, ['Período:', f"{p_start:%d/%m/%Y} – {end:%d/%m/%Y}"])
+    if no_data:
+        info_rows.append(['Sin datos:', ', '.join(no_data) + ' (sin operación en el período)'])
+    info = Table(info_rows, colWidths=[3*cm, 14*cm])
+    info.setStyle(TableStyle([
+        ('FONTSIZE', (0,0), (-1,-1), 10),
+        ('TEXTCOLOR', (0,0), (0,-1), CORP['gray']),
+        ('FONTNAME', (1,0), (1,-1), 'Helvetica-Bold'),
+    ]))
+    story.append(info)
+    story.append(Spacer(1, 20))
+    
+    # === RESUMEN EJECUTIVO ===
+    story.append(Paragraph("1. Resumen Ejecutivo", styles['SectionHeader']))
+    
+    # Tabla resumen
+    headers = ['Enfriador', 'T prom\n(°C)', 'T P95\n(°C)', 'U\n(% limpio)', 
+               'Rf prom\n×10⁻⁴', 'Días s/\nlavado', 'Criticidad', 'Estado']
+    rows = [headers]
+    for d in summary_data:
+        nivel, emoji, _ = get_crit_info(d['criticidad'])
+        rows.append([
+            d['name'], fmt(d['T_mean'], '{:.1f}'), fmt(d['T_p95'], '{:.1f}'),
+            fmt(d['U_pct'], '{:.0f}%'), fmt(d['Rf_mean'], '{:.2f}'),
+            fmt(d['days_wash'], '{:.0f}', 'Sin registro'),
+            f"{fmt(d['criticidad'], '{:.0f}')}/100", f"{emoji} {nivel}"
+        ])
+    
+    tbl = Table(rows, colWidths=[3*cm, 1.6*cm, 1.6*cm, 1.8*cm, 1.8*cm, 1.8*cm, 2*cm, 2.2*cm])
+    tbl.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), CORP['primary']),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,-1), 8),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, CORP['light_bg']]),
+        ('GRID', (0,0), (-1,-1), 0.5, CORP['gray']),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 8),
+        ('TOPPADDING', (0,0), (-1,-1), 8),
+    ]))
+    story.append(tbl)
+    story.append(Spacer(1, 15))
+    
+    # Recomendación
+    if priority_enf and priority_enf['requires_wash']:
+        story.append(Paragraph(
+            f"⚠️ <b>RECOMENDACIÓN:</b> Priorizar <b>{priority_enf['name']}</b> para lavado químico.<br/>"
+            f"Criticidad: {priority_enf['criticidad']:.0f}/100 | "
+            f"T P95: {priority_enf['T_p95']:.1f}°C (límite: {priority_enf['T_limit']:.0f}°C) | "
+            f"Rf P95: {priority_enf['Rf_p95']:.2f}×10⁻⁴",
+            styles['Recommendation']
+        ))
+    else:
+        story.append(Paragraph(
+            "✅ <b>ESTADO:</b> No se detectan condiciones críticas. Mantener monitoreo de rutina.",
+            styles['Body']
+        ))
+    
+    story.append(Spacer(1, 15))
+    
+    # Gráfico comparativo
+    story.append(Paragraph("<b>Comparación entre enfriadores:</b>", styles['Body']))
+    
+    story.append(fig_to_img(png_comp, 17))
+    story.append(PageBreak())
+    
+    # === ANÁLISIS POR ENFRIADOR ===
+    for i, data in enumerate(summary_data):
+        name = data['name']
+        dsg = data['dsg']
+        df_win = data['df_win']
+        
+        story.append(Paragraph(f"2.{i+1}. {name}", styles['SectionHeader']))
+        story.append(Paragraph(
+            f"<b>Diseño:</b> Área: {dsg.get('area_m2', 0):.1f} m² | "
+            f"U limpio: {dsg.get('U_clean_Wm2K', 0):.0f} W/m²K | "
+            f"Q diseño: {dsg.get('Q_design_W', 0)/1e6:.2f} MW | "
+            f"T límite: {dsg.get('T_acid_out_limit', 0):.0f}°C",
+            styles['Small']
+        ))
+        story.append(Spacer(1, 10))
+        
+        # KPIs
+        story.append(Paragraph("<b>Indicadores clave:</b>", styles['SubHeader']))
+        kpi_rows = [
+            ['Parámetro', 'Valor', 'Referencia', 'Estado'],
+            ['T salida promedio', f"{data['T_mean']:.1f} °C", f"Diseño: {data['T_design']:.0f} °C", 
+             '✅' if data['T_mean'] < data['T_limit'] else '⚠️'],
+            ['T salida P95', f"{data['T_p95']:.1f} °C", f"Límite: {data['T_limit']:.0f} °C",
+             '✅' if data['T_p95'] < data['T_limit'] else '🔴'],
+            ['U promedio', f"{data['U_mean']:.0f} W/m²K ({data['U_pct']:.0f}%)", f"Limpio: {data['U_clean']:.0f}",
+             '✅' if data['U_pct'] >= 80 else ('⚠️' if data['U_pct'] >= 60 else '🔴')],
+            ['Rf promedio', f"{data['Rf_mean']:.2f} ×10⁻⁴", f"Diseño: {data['Rf_design']:.2f}",
+             '✅' if data['Rf_mean'] < data['Rf_design'] * 3 else '⚠️'],
+            ['Rf P95', f"{data['Rf_p95']:.2f} ×10⁻⁴", f"Crítico: {data['Rf_crit']:.2f}",
+             '✅' if data['Rf_p95'] < data['Rf_crit'] else '🔴'],
+            ['Criticidad', f"{data['criticidad']:.0f}/100", '<60 normal',
+             '✅' if data['criticidad'] < 60 else ('⚠️' if data['criticidad'] < 80 else '🔴')],
+        ]
+        kpi_tbl = Table(kpi_rows, colWidths=[4.5*cm, 4.5*cm, 4.5*cm, 1.5*cm])
+        kpi_tbl.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), CORP['primary']),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0,0), (-1,-1), 9),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, CORP['light_bg']]),
+            ('GRID', (0,0), (-1,-1), 0.5, CORP['gray']),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+        ]))
+        story.append(kpi_tbl)
+        story.append(Spacer(1, 10))
+        
+        # Interpretaciones
+        story.append(Paragraph("<b>Interpretación:</b>", styles['SubHeader']))
+        interps = []
+        if data['T_p95'] >= data['T_limit']:
+            interps.append(f"⚠️ ALERTA: T P95 ({data['T_p95']:.1f}°C) excede límite ({data['T_limit']:.0f}°C)")
+        elif data['T_p95'] >= data['T_limit'] * 0.95:
+            interps.append(f"🟡 T P95 ({data['T_p95']:.1f}°C) cercana al límite")
+        else:
+            interps.append(f"✅ Temperatura OK: promedio {data['T_mean']:.1f}°C, P95 {data['T_p95']:.1f}°C")
+        
+        if data['Rf_p95'] >= data['Rf_crit']:
+            interps.append(f"🔴 CRÍTICO: Rf P95 ({data['Rf_p95']:.2f}) alcanza nivel crítico")
+        elif data['Rf_p95'] >= data['Rf_design'] * 3:
+            interps.append(f"🟠 Alto ensuciamiento: Rf P95 ({data['Rf_p95']:.2f}) > 3x diseño")
+        else:
+            interps.append(f"✅ Ensuciamiento OK: Rf promedio {data['Rf_mean']:.2f}")
+        
+        if data['U_pct'] < 60:
+            interps.append(f"⚠️ U muy bajo ({data['U_pct']:.0f}% limpio)")
+        elif data['U_pct'] < 80:
+            interps.append(f"🟡 U reducido ({data['U_pct']:.0f}% limpio)")
+        else:
+            interps.append(f"✅ U OK ({data['U_pct']:.0f}% limpio)")
+        
+        nivel, emoji, _ = get_crit_info(data['criticidad'])
+        interps.append(f"{emoji} Criticidad {nivel}: {data['criticidad']:.0f}/100")
+        
+        for interp in interps:
+            story.append(Paragraph(f"• {interp}", styles['Body']))
+        story.append(Spacer(1, 10))
+        
+        # Gráficos
+        story.append(Paragraph("<b>Tendencias:</b>", styles['SubHeader']))
+        
+        png_thermal, png_fouling, png_crit = png_cooler[i]
+        story.append(fig_to_img(png_thermal, 16.5))
+        story.append(Spacer(1, 8))
+        story.append(fig_to_img(png_fouling, 16.5))
+        story.append(Spacer(1, 8))
+        story.append(fig_to_img(png_crit, 16.5))
+        
+        story.append(PageBreak())
+    
+    # === HISTORIAL DE LAVADOS ===
+    story.append(Paragraph("3. Historial de Lavados Químicos", styles['SectionHeader']))
+    
+    story.append(fig_to_img(png_wash, 17))
+    story.append(Spacer(1, 15))
+    
+    # Tabla resumen lavados
+    wash_rows = [['Enfriador', 'Total lavados', 'Último lavado', 'Intervalo promedio']]
+    if washes is not None and not washes.empty:
+        w = washes.copy()
+        w['wash_ts'] = pd.to_datetime(w['wash_ts'], errors='coerce')
+        w = w.dropna(subset=['wash_ts', 'enfriador_key'])
+        for key in ['TS', 'TAI', 'TAF']:
+            wk = w[w['enfriador_key'] == key].sort_values('wash_ts')
+            name = DESIGN_PARAMS.get(key, {}).get('short_name', key)
+            if wk.empty:
+                wash_rows.append([name, '0', 'Sin registros', 'N/D'])
+            else:
+                intervals = wk['wash_ts'].diff().dt.days.dropna()
+                wash_rows.append([name, str(len(wk)), wk['wash_ts'].max().strftime('%d/%m/%Y'),
+                                f"{intervals.mean():.0f} días" if len(intervals) > 0 else 'N/D'])
+    else:
+        for key in ['TS', 'TAI', 'TAF']:
+            wash_rows.append([DESIGN_PARAMS.get(key, {}).get('short_name', key), '0', 'Sin registros', 'N/D'])
+    
+    wash_tbl = Table(wash_rows, colWidths=[4.5*cm, 3.5*cm, 4*cm, 4*cm])
+    wash_tbl.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), CORP['primary']),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,-1), 10),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, CORP['light_bg']]),
+        ('GRID', (0,0), (-1,-1), 0.5, CORP['gray']),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 8),
+    ]))
+    story.append(wash_tbl)
+    story.append(Spacer(1, 20))
+    
+    # Notas
+    story.append(Paragraph(
+        "<b>Notas:</b><br/>"
+        "• P95 = Percentil 95 (valor no superado por el 95% de las mediciones)<br/>"
+        "• Rf = Factor de ensuciamiento (resistencia térmica adicional)<br/>"
+        "• U = Coeficiente global de transferencia de calor<br/>"
+        "• Criticidad combina: temperatura (30%), ensuciamiento (35%), eficiencia U (25%), tiempo sin lavado (10%)",
+        styles['Small']
+    ))
+    
+    doc.build(story)
+    buffer.seek(0)
+    return buffer.getvalue()
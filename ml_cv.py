@@ -0,0 +1,233 @@
+# ============================================================
+# Validación cruzada temporal de modelos - Enfriadores CAP-3
+# ============================================================
+# Forward-chaining por ciclos de lavado:
+# - Cada fold prueba un bloque de ciclos (entre lavados) posterior a todo
+#   el entrenamiento; nunca se entrena con datos futuros.
+# - Se purgan del entrenamiento las filas dentro del horizonte previo al
+#   bloque de prueba (su etiqueta mira hacia el período de prueba).
+# - Los candidatos x folds se evalúan en un pool de procesos; las funciones
+#   de trabajo viven aquí (módulo importable, sin Streamlit) para poder
+#   serializarse hacia los procesos hijos.
+# - Cada entrenamiento reporta tiempo y memoria pico (tracemalloc).
+# - Los candidatos en ONLINE admiten partial_fit con filas nuevas.
+# - sklearn se importa al crear o evaluar un candidato, no al importar el
+#   módulo (arranque rápido del dashboard).
+# ============================================================
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from perf import MEMORY
+
+CANDIDATES = ["LogisticRegression", "GradientBoosting", "RandomForest", "HistGradientBoosting", "SGDOnline"]
+ONLINE = {"SGDOnline"}
+
+
+def make_candidate(name: str, n_jobs: int = -1) -> Tuple[Any, Any]:
+    """``(scaler, modelo)`` sin entrenar para un candidato (scaler puede ser None)."""
+    from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    from sklearn.preprocessing import RobustScaler, StandardScaler
+
+    if name == "LogisticRegression":
+        return RobustScaler(), LogisticRegression(max_iter=2000, class_weight="balanced")
+    if name == "GradientBoosting":
+        return StandardScaler(), GradientBoostingClassifier(random_state=42, n_estimators=220, max_depth=3)
+    if name == "RandomForest":
+        return None, RandomForestClassifier(n_estimators=500, max_depth=10, min_samples_leaf=8,
+                                            class_weight="balanced_subsample", random_state=42, n_jobs=n_jobs)
+    if name == "HistGradientBoosting":
+        return None, HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, max_leaf_nodes=31,
+                                                    l2_regularization=1.0, class_weight="balanced",
+                                                    early_stopping=False, random_state=42)
+    if name == "SGDOnline":
+        return StandardScaler(), SGDClassifier(loss="log_loss", alpha=1e-4, average=True, random_state=42)
+    raise ValueError(f"Candidato desconocido: {name}")
+
+
+def _balanced_weights(y: np.ndarray) -> np.ndarray:
+    """Pesos por muestra equivalentes a ``class_weight="balanced"`` (partial_fit no lo admite)."""
+    counts = np.bincount(y, minlength=2).astype(float)
+    w = len(y) / (2.0 * np.maximum(counts, 1.0))
+    return w[y]
+
+
+def fit_candidate(name: str, X: np.ndarray, y: np.ndarray, n_jobs: int = -1) -> Tuple[Any, Any]:
+    """Entrena un candidato y retorna ``(scaler, modelo)``."""
+    scaler, model = make_candidate(name, n_jobs)
+    Xs = scaler.fit_transform(X) if scaler is not None else X
+    if name in ONLINE:
+        model.fit(Xs, y, sample_weight=_balanced_weights(y))
+    else:
+        model.fit(Xs, y)
+    return scaler, model
+
+
+def update_candidate(name: str, scaler: Any, model: Any, X_new: np.ndarray, y_new: np.ndarray) -> Any:
+    """
+    Actualiza un candidato ONLINE con filas nuevas (``partial_fit``), sin
+    reentrenar. El scaler queda fijo para no desplazar los coeficientes ya
+    aprendidos.
+    """
+    if name not in ONLINE:
+        raise ValueError(f"{name} no admite actualización incremental")
+    Xs = scaler.transform(X_new) if scaler is not None else X_new
+    model.partial_fit(Xs, y_new, classes=np.array([0, 1]), sample_weight=_balanced_weights(y_new))
+    return model
+
+
+def measure(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, float, float]:
+    """
+    Ejecuta ``fn`` y retorna ``(resultado, segundos, MB pico)``. La memoria
+    pico es la de tracemalloc (asignaciones Python/numpy sobre la base al
+    iniciar), medida sobre ``perf.MEMORY`` para no pisar las etapas trazadas
+    de ``perf`` que corran en paralelo.
+    """
+    with MEMORY.watch() as mem:
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - t0
+    return result, seconds, mem["mb"]
+
+
+def predict_candidate(scaler: Any, model: Any, X: np.ndarray) -> np.ndarray:
+    """Probabilidad de la clase positiva."""
+    return model.predict_proba(scaler.transform(X) if scaler is not None else X)[:, 1]
+
+
+def wash_cycles(ts: np.ndarray, wash_ts: np.ndarray) -> np.ndarray:
+    """Índice de ciclo de cada fila: cantidad de lavados en o antes de su timestamp."""
+    w = np.sort(np.asarray(wash_ts, dtype="datetime64[ns]"))
+    w = w[~np.isnat(w)]
+    return np.searchsorted(w, np.asarray(ts, dtype="datetime64[ns]"), side="right")
+
+
+def forward_chaining_folds(ts: np.ndarray, wash_ts: np.ndarray, horizon_days: int,
+                           n_folds: int = 4) -> List[Dict[str, Any]]:
+    """
+    Folds forward-chaining alineados a ciclos de lavado.
+
+    Con al menos ``n_folds + 1`` ciclos se agrupan ciclos consecutivos en
+    ``n_folds + 1`` bloques; si no, bloques de tiempo de igual cantidad de
+    filas. El fold k prueba el bloque k+1 y entrena con las filas anteriores
+    a su inicio menos ``horizon_days`` (purga). ``ts`` debe venir ordenado.
+    """
+    ts = np.asarray(ts, dtype="datetime64[ns]")
+    n = len(ts)
+    cycles = wash_cycles(ts, wash_ts)
+    uniq = np.unique(cycles)
+    if len(uniq) >= n_folds + 1:
+        groups = np.array_split(uniq, n_folds + 1)
+        block_starts = [int(np.searchsorted(cycles, g[0], side="left")) for g in groups]
+        by = "ciclos"
+    else:
+        block_starts = [int(b[0]) for b in np.array_split(np.arange(n), n_folds + 1) if len(b)]
+        by = "tiempo"
+    block_starts.append(n)
+
+    gap = np.timedelta64(int(horizon_days), "D")
+    folds = []
+    for k in range(1, len(block_starts) - 1):
+        lo, hi = block_starts[k], block_starts[k + 1]
+        if hi <= lo:
+            continue
+        train_end = int(np.searchsorted(ts, ts[lo] - gap, side="left"))
+        if train_end == 0:
+            continue
+        folds.append({"fold": len(folds) + 1, "train": np.arange(train_end), "test": np.arange(lo, hi),
+                      "test_start": ts[lo], "by": by})
+    return folds
+
+
+def _eval_fold(name: str, fold: int, trace: bool, X_train: np.ndarray, y_train: np.ndarray,
+               X_test: np.ndarray, y_test: np.ndarray) -> Dict[str, Any]:
+    """
+    Trabajo de un (candidato, fold): entrena, evalúa y mide tiempo. Con
+    ``trace`` también mide memoria pico (tracemalloc encarece el ajuste, así
+    que ese tiempo no se usa en el resumen).
+    """
+    row = {"Modelo": name, "Fold": fold, "n_train": len(y_train), "n_test": len(y_test),
+           "pos_test": int(y_test.sum()), "PR-AUC": np.nan, "ROC-AUC": np.nan, "fit_s": np.nan,
+           "mem_MB": np.nan, "traced": trace}
+    # Sin ambas clases no hay métrica que calcular: no se entrena
+    if len(np.unique(y_train)) < 2 or len(np.unique(y_test)) < 2:
+        return row
+    if trace:
+        (scaler, model), row["fit_s"], row["mem_MB"] = measure(fit_candidate, name, X_train, y_train, n_jobs=1)
+    else:
+        t0 = time.perf_counter()
+        scaler, model = fit_candidate(name, X_train, y_train, n_jobs=1)
+        row["fit_s"] = time.perf_counter() - t0
+    from sklearn.metrics import average_precision_score, roc_auc_score
+
+    p = predict_candidate(scaler, model, X_test)
+    row["PR-AUC"] = average_precision_score(y_test, p)
+    row["ROC-AUC"] = roc_auc_score(y_test, p)
+    return row
+
+
+def cross_validate(X: pd.DataFrame, y: pd.Series, ts: Sequence, wash_ts: Sequence, horizon_days: int,
+                   candidates: Sequence[str] = CANDIDATES, n_folds: int = 4,
+                   max_workers: Optional[int] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Evalúa ``candidates`` en folds forward-chaining, en paralelo.
+
+    Retorna ``folds`` (una fila por candidato y fold con PR-AUC, ROC-AUC,
+    tiempo y memoria pico de entrenamiento), ``summary`` (medias por
+    candidato, tiempo medio por fold sin tracemalloc, memoria pico del fold
+    con más entrenamiento) y ``wall_s`` del proceso completo. Con un
+    solo worker se evalúa en el proceso actual. ``progress(hechos, total)``
+    se llama al terminar cada (candidato, fold).
+    """
+    t0 = time.perf_counter()
+    ts = pd.to_datetime(pd.Series(ts)).to_numpy(dtype="datetime64[ns]")
+    wash_ts = pd.to_datetime(pd.Series(wash_ts, dtype=object), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    order = np.argsort(ts, kind="stable")
+    ts, Xa, ya = ts[order], np.asarray(X, dtype=float)[order], np.asarray(y, dtype=int)[order]
+
+    folds = forward_chaining_folds(ts, wash_ts, horizon_days, n_folds)
+    # Memoria: se mide en el último fold evaluable (el de mayor entrenamiento)
+    evaluable = [f["fold"] for f in folds
+                 if len(np.unique(ya[f["train"]])) == 2 and len(np.unique(ya[f["test"]])) == 2]
+    traced = evaluable[-1] if evaluable else None
+    tasks = [(name, f["fold"], f["fold"] == traced, Xa[f["train"]], ya[f["train"]], Xa[f["test"]], ya[f["test"]])
+             for name in candidates for f in folds]
+
+    workers = max_workers if max_workers is not None else min(len(tasks), os.cpu_count() or 1)
+    rows: List[Dict[str, Any]] = [{} for _ in tasks]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = {pool.submit(_eval_fold, *t): i for i, t in enumerate(tasks)}
+            for done, fut in enumerate(as_completed(futures), start=1):
+                rows[futures[fut]] = fut.result()
+                if progress is not None:
+                    progress(done, len(tasks))
+    else:
+        for i, t in enumerate(tasks):
+            rows[i] = _eval_fold(*t)
+            if progress is not None:
+                progress(i + 1, len(tasks))
+    wall = time.perf_counter() - t0
+
+    df_folds = pd.DataFrame(rows, columns=["Modelo", "Fold", "n_train", "n_test", "pos_test",
+                                           "PR-AUC", "ROC-AUC", "fit_s", "mem_MB", "traced"])
+    timing = df_folds["fit_s"].where(~df_folds["traced"].astype(bool) | (len(evaluable) < 2))
+    summary = (df_folds.assign(fit_untraced=timing).groupby("Modelo", sort=False)
+               .agg(**{"PR-AUC": ("PR-AUC", "mean"), "ROC-AUC": ("ROC-AUC", "mean"),
+                       "Folds": ("PR-AUC", "count"), "Entrenamiento (s/fold)": ("fit_untraced", "mean"),
+                       "Memoria pico (MB)": ("mem_MB", "max")})
+               .reset_index())
+    return {"folds": df_folds, "summary": summary, "wall_s": wall, "workers": workers,
+            "by": folds[0]["by"] if folds else ""}
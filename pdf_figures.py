@@ -0,0 +1,265 @@
+# ============================================================
+# Figuras del reporte PDF - Enfriadores CAP-3
+# ============================================================
+# - Cada figura se dibuja con matplotlib (backend Agg) y se retorna como
+#   PNG (bytes); las funciones viven aquí (módulo importable, sin
+#   Streamlit) para poder ejecutarse en un pool de procesos.
+# - Los PNG se guardan en disco con una clave que incluye enfriador,
+#   ventana y versión de datos: regenerar un reporte sin cambios los reusa.
+# ============================================================
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from perf import instrumented
+
+# Cambiar al modificar el dibujo de cualquier figura (invalida el caché)
+FIGURE_VERSION = 1
+DPI = 150
+
+
+def _pyplot():
+    """pyplot con backend sin pantalla (seguro en hilos y procesos hijos)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    return plt, mdates
+
+
+def _to_png(plt, fig) -> bytes:
+    plt.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=DPI, bbox_inches='tight', facecolor='white')
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def comparative_png(rows: Sequence[Dict[str, Any]]) -> bytes:
+    """Barras de criticidad, T P95 y Rf P95 por enfriador (``rows`` del resumen)."""
+    plt, _ = _pyplot()
+    fig_comp, axes = plt.subplots(1, 3, figsize=(12, 3.5))
+    names = [d['name'] for d in rows]
+    x = np.arange(len(names))
+
+    # Criticidad
+    crits = [d['criticidad'] for d in rows]
+    colors_crit = ['#27AE60' if c < 30 else '#F39C12' if c < 60 else '#E67E22' if c < 80 else '#E74C3C' for c in crits]
+    axes[0].bar(x, crits, 0.6, color=colors_crit, edgecolor='white', linewidth=2)
+    axes[0].axhline(80, color='red', linestyle='--', alpha=0.7)
+    axes[0].axhline(60, color='orange', linestyle=':', alpha=0.5)
+    axes[0].set_ylabel('Criticidad'); axes[0].set_title('Índice de Criticidad', fontweight='bold')
+    axes[0].set_xticks(x); axes[0].set_xticklabels(names, fontsize=9); axes[0].set_ylim(0, 100)
+
+    # T P95
+    temps = [d['T_p95'] for d in rows]
+    limits = [d['T_limit'] for d in rows]
+    colors_t = ['#E74C3C' if t >= l else '#27AE60' for t, l in zip(temps, limits)]
+    axes[1].bar(x, temps, 0.6, color=colors_t, edgecolor='white', linewidth=2)
+    for i, l in enumerate(limits):
+        axes[1].hlines(l, i-0.4, i+0.4, color='red', linestyle='--', linewidth=2)
+    axes[1].set_ylabel('T P95 (°C)'); axes[1].set_title('Temperatura vs Límite', fontweight='bold')
+    axes[1].set_xticks(x); axes[1].set_xticklabels(names, fontsize=9)
+
+    # Rf P95
+    rfs = [d['Rf_p95'] for d in rows]
+    rf_crits = [d['Rf_crit'] for d in rows]
+    colors_rf = ['#E74C3C' if r >= c else '#F39C12' if r >= c*0.6 else '#27AE60' for r, c in zip(rfs, rf_crits)]
+    axes[2].bar(x, rfs, 0.6, color=colors_rf, edgecolor='white', linewidth=2)
+    for i, c in enumerate(rf_crits):
+        axes[2].hlines(c, i-0.4, i+0.4, color='red', linestyle='--', linewidth=2)
+    axes[2].set_ylabel('Rf P95 ×10⁻⁴'); axes[2].set_title('Ensuciamiento vs Crítico', fontweight='bold')
+    axes[2].set_xticks(x); axes[2].set_xticklabels(names, fontsize=9)
+    return _to_png(plt, fig_comp)
+
+
+def thermal_png(df: pd.DataFrame, ts_col: str, data: Dict[str, Any]) -> bytes:
+    """Temperaturas del ácido y carga térmica de un enfriador."""
+    plt, mdates = _pyplot()
+    name = data['name']
+    fig1, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 4.5), sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+    ax1.plot(df[ts_col], df['T_a_in'], label='T entrada', linewidth=1.2, alpha=0.8)
+    ax1.plot(df[ts_col], df['T_a_out'], label='T salida', linewidth=1.8)
+    ax1.axhline(data['T_limit'], color='red', linestyle='--', label=f"Límite ({data['T_limit']:.0f}°C)")
+    ax1.axhline(data['T_design'], color='green', linestyle=':', label=f"Diseño ({data['T_design']:.0f}°C)")
+    ax1.fill_between(df[ts_col], data['T_limit'], df['T_a_out'].max()*1.1, alpha=0.1, color='red')
+    ax1.set_ylabel('Temperatura (°C)'); ax1.legend(loc='upper left', fontsize=8); ax1.grid(True, alpha=0.3)
+    ax1.set_title(f'{name} - Temperaturas y Carga Térmica', fontsize=11, fontweight='bold', color='#0B2D5B')
+
+    q_mw = df['Q_used_W'] / 1e6
+    ax2.fill_between(df[ts_col], 0, q_mw, alpha=0.5, color='#3498db')
+    ax2.plot(df[ts_col], q_mw, linewidth=1.2, color='#2980b9')
+    ax2.axhline(data['Q_design'], color='green', linestyle=':', label=f"Diseño ({data['Q_design']:.1f} MW)")
+    ax2.set_ylabel('Q (MW)'); ax2.set_xlabel('Fecha'); ax2.legend(fontsize=8); ax2.grid(True, alpha=0.3)
+    ax2.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    return _to_png(plt, fig1)
+
+
+def fouling_png(df: pd.DataFrame, ts_col: str, data: Dict[str, Any]) -> bytes:
+    """Rf y coeficiente U de un enfriador."""
+    plt, mdates = _pyplot()
+    name = data['name']
+    fig2, (ax3, ax4) = plt.subplots(2, 1, figsize=(10, 4.5), sharex=True)
+    ax3.plot(df[ts_col], df['Rf_x1e4'], linewidth=1.8, color='#e74c3c')
+    ax3.axhline(data['Rf_design'], color='green', linestyle=':', label=f"Diseño ({data['Rf_design']:.2f})")
+    ax3.axhline(data['Rf_crit'], color='red', linestyle='--', label=f"Crítico ({data['Rf_crit']:.2f})")
+    ax3.fill_between(df[ts_col], data['Rf_crit'], df['Rf_x1e4'].max()*1.2, alpha=0.1, color='red')
+    ax3.set_ylabel('Rf ×10⁻⁴'); ax3.legend(fontsize=8); ax3.grid(True, alpha=0.3)
+    ax3.set_title(f'{name} - Ensuciamiento y Coeficiente U', fontsize=11, fontweight='bold', color='#0B2D5B')
+
+    ax4.plot(df[ts_col], df['U_Wm2K'], linewidth=1.8, color='#3498db')
+    ax4.axhline(data['U_clean'], color='green', linestyle=':', label=f"U limpio ({data['U_clean']:.0f})")
+    ax4.axhline(data['U_clean']*0.6, color='orange', linestyle='--', label='60% limpio')
+    ax4.fill_between(df[ts_col], 0, data['U_clean']*0.6, alpha=0.1, color='orange')
+    ax4.set_ylabel('U (W/m²K)'); ax4.set_xlabel('Fecha'); ax4.legend(fontsize=8); ax4.grid(True, alpha=0.3)
+    ax4.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    return _to_png(plt, fig2)
+
+
+def criticidad_png(df: pd.DataFrame, ts_col: str, data: Dict[str, Any]) -> bytes:
+    """Índice de criticidad de un enfriador con bandas de nivel."""
+    plt, mdates = _pyplot()
+    name = data['name']
+    fig3, ax5 = plt.subplots(figsize=(10, 3))
+    ax5.fill_between(df[ts_col], 0, df['criticidad'], alpha=0.4, color='#3498db')
+    ax5.plot(df[ts_col], df['criticidad'], linewidth=2, color='#2980b9')
+    ax5.axhspan(0, 30, alpha=0.1, color='green'); ax5.axhspan(30, 60, alpha=0.1, color='yellow')
+    ax5.axhspan(60, 80, alpha=0.1, color='orange'); ax5.axhspan(80, 100, alpha=0.15, color='red')
+    ax5.axhline(80, color='red', linestyle='--', alpha=0.7)
+    ax5.axhline(60, color='orange', linestyle=':', alpha=0.5)
+    ax5.set_ylabel('Criticidad (0-100)'); ax5.set_xlabel('Fecha'); ax5.set_ylim(0, 105)
+    ax5.grid(True, alpha=0.3)
+    ax5.set_title(f'{name} - Índice de Criticidad', fontsize=11, fontweight='bold', color='#0B2D5B')
+    ax5.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    return _to_png(plt, fig3)
+
+
+def washes_png(washes: Optional[pd.DataFrame]) -> bytes:
+    """Timeline de lavados de los tres enfriadores."""
+    plt, mdates = _pyplot()
+    fig_wash, ax_w = plt.subplots(figsize=(10, 2.8))
+    if washes is not None and not washes.empty:
+        w = washes.copy()
+        w['wash_ts'] = pd.to_datetime(w['wash_ts'], errors='coerce')
+        w = w.dropna(subset=['wash_ts', 'enfriador_key']).sort_values('wash_ts')
+        y_map = {'TS': 2, 'TAI': 1, 'TAF': 0}
+        c_map = {'TS': '#3498db', 'TAI': '#e74c3c', 'TAF': '#27ae60'}
+        l_map = {'TS': 'Torre Secado', 'TAI': 'Torre Interpaso', 'TAF': 'Torre Final'}
+        for key in ['TS', 'TAI', 'TAF']:
+            wk = w[w['enfriador_key'] == key]
+            if not wk.empty:
+                ax_w.scatter(wk['wash_ts'], [y_map[key]]*len(wk), s=100, c=c_map[key], marker='D',
+                           label=l_map[key], edgecolors='white', linewidths=2, zorder=3)
+        ax_w.set_yticks([0, 1, 2]); ax_w.set_yticklabels(['Torre Final', 'Torre Interpaso', 'Torre Secado'])
+        ax_w.legend(loc='upper right', fontsize=8)
+    else:
+        ax_w.text(0.5, 0.5, 'Sin registros de lavados', ha='center', va='center', fontsize=14, color='gray', transform=ax_w.transAxes)
+        ax_w.axis('off')
+    ax_w.set_xlabel('Fecha'); ax_w.grid(True, alpha=0.3, axis='x'); ax_w.set_ylim(-0.5, 2.5)
+    ax_w.set_title('Timeline de Lavados', fontsize=11, fontweight='bold', color='#0B2D5B')
+    ax_w.xaxis.set_major_formatter(mdates.DateFormatter('%b %Y'))
+    return _to_png(plt, fig_wash)
+
+
+RENDERERS = {
+    "comparativo": comparative_png,
+    "termico": thermal_png,
+    "ensuciamiento": fouling_png,
+    "criticidad": criticidad_png,
+    "lavados": washes_png,
+}
+
+# pyplot no es seguro entre hilos: las sesiones que renderizan en serie se turnan
+_RENDER_LOCK = threading.Lock()
+
+
+def _render(kind: str, args: Tuple) -> bytes:
+    """Trabajo de una figura (ejecutable en un proceso hijo)."""
+    return RENDERERS[kind](*args)
+
+
+def figure_key(kind: str, *parts: Any) -> str:
+    """Clave de caché: tipo de figura + enfriador, ventana, versión de datos, etc."""
+    raw = json.dumps([FIGURE_VERSION, kind, *parts], sort_keys=True, default=str)
+    return f"{kind}-{hashlib.blake2b(raw.encode('utf-8'), digest_size=10).hexdigest()}"
+
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f"{key}.png")
+
+
+def _prune(cache_dir: str, max_files: int) -> None:
+    """Conserva solo los ``max_files`` PNG usados más recientemente."""
+    try:
+        entries = sorted((e for e in os.scandir(cache_dir) if e.name.endswith(".png")),
+                         key=lambda e: e.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for entry in entries[max(max_files, 1):]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+@instrumented()
+def render_figures(jobs: Sequence[Tuple[Optional[str], str, Tuple]], cache_dir: Optional[str] = None,
+                   max_workers: Optional[int] = None, max_files: int = 256) -> Tuple[List[bytes], Dict[str, int]]:
+    """
+    Renderiza ``jobs`` = ``[(clave, tipo, args), ...]`` y retorna los PNG en
+    el mismo orden, más conteos ``{"cache": n, "rendered": n, "workers": n}``.
+
+    Los PNG con clave se leen/escriben en ``cache_dir`` (clave None = sin
+    caché). Los faltantes se dibujan en un pool de procesos si hay más de
+    un worker disponible; si no, en el proceso actual.
+    """
+    pngs: List[Optional[bytes]] = [None] * len(jobs)
+    missing = []
+    for i, (key, kind, args) in enumerate(jobs):
+        if cache_dir and key:
+            try:
+                path = _cache_path(cache_dir, key)
+                with open(path, "rb") as f:
+                    pngs[i] = f.read()
+                os.utime(path)
+                continue
+            except OSError:
+                pass
+        missing.append(i)
+
+    workers = max_workers if max_workers is not None else min(len(missing), os.cpu_count() or 1)
+    if workers > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            rendered = list(pool.map(_render, [jobs[i][1] for i in missing], [jobs[i][2] for i in missing]))
+    else:
+        workers = 1
+        with _RENDER_LOCK:
+            rendered = [_render(jobs[i][1], jobs[i][2]) for i in missing]
+
+    for i, png in zip(missing, rendered):
+        pngs[i] = png
+        key = jobs[i][0]
+        if cache_dir and key:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                path = _cache_path(cache_dir, key)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(png)
+                os.replace(tmp, path)
+            except OSError:
+                pass
+    if cache_dir and missing:
+        _prune(cache_dir, max_files)
+    return pngs, {"cache": len(jobs) - len(missing), "rendered": len(missing), "workers": workers}
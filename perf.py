@@ -0,0 +1,240 @@
+# ============================================================
+# Instrumentación por etapa - Enfriadores CAP-3
+# ============================================================
+# Registro liviano de tiempo, filas y memoria pico de cada etapa del
+# pipeline. Las etapas se marcan con el decorador ``instrumented`` o con el
+# context manager ``perf_stage``; las corridas (una ejecución del dashboard,
+# un entrenamiento de fondo) se abren con ``PERF_LOG.run``.
+#
+# - Tiempo y filas se miden siempre (costo despreciable).
+# - La memoria pico (tracemalloc) solo se mide en corridas abiertas con
+#   ``trace_memory=True``: tracemalloc hace más lentas las etapas. El pico
+#   es del proceso, por lo que incluye lo que asignen otros hilos en ese
+#   intervalo (p. ej. un entrenamiento en segundo plano).
+# - Etapas anidadas quedan con su ``parent``; el pico de una etapa incluye
+#   el de sus hijas.
+# - ``MEMORY`` es el único dueño de tracemalloc en el proceso: las etapas y
+#   ``ml_cv.measure`` abren mediciones sobre él, que lo inician y detienen
+#   por conteo de referencias y no se pisan el pico entre sí.
+# ============================================================
+
+from __future__ import annotations
+
+import functools
+import itertools
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+RECORD_COLUMNS = ["run", "label", "seq", "started", "stage", "parent", "depth", "seconds", "rows_in", "rows_out",
+                  "peak_mb", "thread"]
+
+
+def count_rows(obj: Any) -> Optional[int]:
+    """Filas de un DataFrame/Series (o suma de un dict de ellos; de una tupla se usa el primero)."""
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, dict) and obj and all(isinstance(v, (pd.DataFrame, pd.Series)) for v in obj.values()):
+        return int(sum(len(v) for v in obj.values()))
+    return None
+
+
+class MemoryTracer:
+    """
+    Mediciones de memoria pico sobre un único tracemalloc compartido.
+
+    La primera medición abierta inicia tracemalloc y la última lo detiene
+    (si lo inició). Antes de reiniciar el pico para una medición nueva, el
+    pico acumulado se traspasa a todas las abiertas, de cualquier hilo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: Dict[int, Dict[str, Any]] = {}
+        self._ids = itertools.count()
+        self._started = False
+
+    def _fold(self) -> None:
+        peak = tracemalloc.get_traced_memory()[1]
+        for w in self._open.values():
+            w["peak"] = max(w["peak"], peak)
+
+    @contextmanager
+    def watch(self) -> Iterator[Dict[str, Any]]:
+        """Mide el bloque; al cerrar, ``mb`` tiene el pico sobre la base al abrir (MB)."""
+        w: Dict[str, Any] = {"base": 0, "peak": 0, "mb": None}
+        with self._lock:
+            if not self._open and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            self._fold()
+            tracemalloc.reset_peak()
+            w["base"] = tracemalloc.get_traced_memory()[0]
+            wid = next(self._ids)
+            self._open[wid] = w
+        try:
+            yield w
+        finally:
+            with self._lock:
+                self._fold()
+                del self._open[wid]
+                if not self._open and self._started:
+                    tracemalloc.stop()
+                    self._started = False
+            w["mb"] = max(w["peak"] - w["base"], 0) / 1e6
+
+
+MEMORY = MemoryTracer()
+
+
+class PerfLog:
+    """
+    Registros de etapas en memoria (los últimos ``max_records``), seguro entre hilos.
+
+    Cada hilo tiene su propia pila de etapas y su corrida activa; las etapas
+    fuera de una corrida quedan con ``run=None``.
+    """
+
+    def __init__(self, max_records: int = 2000):
+        self._records: deque = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._run_ids = itertools.count(1)
+        self._seq = itertools.count()
+
+    # --- Corridas ---------------------------------------------------------
+    @contextmanager
+    def run(self, label: str = "", trace_memory: bool = False) -> Iterator[int]:
+        """Abre una corrida en el hilo actual; retorna su id."""
+        prev = getattr(self._local, "run", None)
+        run_id = next(self._run_ids)
+        self._local.run = (run_id, label, trace_memory)
+        try:
+            yield run_id
+        finally:
+            self._local.run = prev
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    # --- Etapas -----------------------------------------------------------
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Mide el bloque como etapa ``name``. El registro se entrega para que el
+        bloque complete ``rows_out`` (u otros campos) antes de cerrarse.
+        """
+        run_id, label, trace = getattr(self._local, "run", None) or (None, "", False)
+        stack = self._stack()
+        rec = {"run": run_id, "label": label, "seq": next(self._seq),
+               "started": datetime.now().isoformat(timespec="milliseconds"), "stage": name,
+               "parent": stack[-1] if stack else None, "depth": len(stack),
+               "seconds": None, "rows_in": rows_in, "rows_out": None, "peak_mb": None,
+               "thread": threading.current_thread().name}
+        stack.append(name)
+        mem = None
+        try:
+            # La etapa madre sigue abierta en MEMORY: recibe el pico de sus hijas
+            with MEMORY.watch() if trace else nullcontext() as mem:
+                t0 = time.perf_counter()
+                try:
+                    yield rec
+                finally:
+                    rec["seconds"] = time.perf_counter() - t0
+        finally:
+            stack.pop()
+            if mem is not None:
+                rec["peak_mb"] = mem["mb"]
+            with self._lock:
+                self._records.append(rec)
+
+    # --- Consulta y exportación ------------------------------------------
+    def records(self, run: Optional[int] = None) -> pd.DataFrame:
+        """Registros (de una corrida o todos), en orden de término."""
+        with self._lock:
+            recs = [dict(r) for r in self._records if run is None or r["run"] == run]
+        df = pd.DataFrame(recs, columns=RECORD_COLUMNS)
+        for c in ["seconds", "peak_mb"]:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+        for c in ["run", "rows_in", "rows_out"]:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+        return df
+
+    def runs(self) -> pd.DataFrame:
+        """Corridas con registros: id, etiqueta, inicio, etapas y tiempo total de primer nivel."""
+        df = self.records().dropna(subset=["run"])
+        if df.empty:
+            return pd.DataFrame(columns=["run", "label", "started", "stages", "seconds"])
+        top = df[df["depth"] == df.groupby("run")["depth"].transform("min")]
+        out = df.groupby("run").agg(label=("label", "first"), started=("started", "min"), stages=("stage", "size"))
+        out["seconds"] = top.groupby("run")["seconds"].sum()
+        out = out.reset_index().sort_values("run", ascending=False)
+        out["run"] = out["run"].astype(int)
+        return out
+
+    def summary(self, run: int) -> pd.DataFrame:
+        """Etapas de una corrida agregadas por (madre, etapa): llamadas, tiempo, filas y pico."""
+        df = self.records(run)
+        if df.empty:
+            return pd.DataFrame(columns=["Etapa", "Llamadas", "Tiempo (s)", "Filas entrada", "Filas salida",
+                                         "Memoria pico (MB)"])
+        # Llamadas repetidas (una por enfriador) se suman; orden de primer inicio
+        g = df.groupby(["depth", "parent", "stage"], dropna=False, sort=False)
+        out = g.agg(first=("seq", "min"), calls=("stage", "size"), seconds=("seconds", "sum"),
+                    rows_in=("rows_in", lambda s: s.sum(min_count=1)),
+                    rows_out=("rows_out", lambda s: s.sum(min_count=1)),
+                    peak=("peak_mb", "max")).reset_index().sort_values("first")
+        out["Etapa"] = [("\u2003" * (int(d) - 1) + "↳ " if d else "") + s for d, s in zip(out["depth"], out["stage"])]
+        return out.rename(columns={"calls": "Llamadas", "seconds": "Tiempo (s)", "rows_in": "Filas entrada",
+                                   "rows_out": "Filas salida", "peak": "Memoria pico (MB)"})[
+            ["Etapa", "Llamadas", "Tiempo (s)", "Filas entrada", "Filas salida", "Memoria pico (MB)"]]
+
+    def to_csv(self, run: Optional[int] = None) -> str:
+        return self.records(run).to_csv(index=False)
+
+    def to_json(self, run: Optional[int] = None) -> str:
+        df = self.records(run).astype(object)
+        recs = df.where(df.notna(), None).to_dict(orient="records")
+        return json.dumps({"exported": datetime.now().isoformat(timespec="seconds"), "records": recs},
+                          indent=2, ensure_ascii=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+PERF_LOG = PerfLog()
+
+
+def perf_stage(name: str, rows_in: Optional[int] = None):
+    """Context manager de etapa sobre el registro global."""
+    return PERF_LOG.stage(name, rows_in)
+
+
+def instrumented(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorador de etapa: registra tiempo, filas del primer argumento (entrada),
+    filas del resultado (salida) y, si la corrida lo pide, memoria pico.
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with PERF_LOG.stage(stage_name, count_rows(args[0]) if args else None) as rec:
+                result = fn(*args, **kwargs)
+                rec["rows_out"] = count_rows(result)
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,188 @@
+# ============================================================
+# Reportes PDF sin navegador - Enfriadores CAP-3
+# ============================================================
+# Uso:
+#   python report_cli.py --out reportes/                       # ventana global
+#   python report_cli.py --out reportes/ --window-days 30
+#   python report_cli.py --out reportes/ --start 2025-01-01 --end 2025-03-31
+#   python report_cli.py --out reportes/ --backfill --workers 4  # un PDF por mes
+#
+# Ejecuta el mismo pipeline del dashboard (historian + lavados ->
+# enfriadores -> pirámides) sin Streamlit y escribe la salida de
+# generate_pdf. El modo --backfill genera un reporte por mes de historia en
+# procesos paralelos; los meses completos ya archivados se omiten salvo
+# --force, y el mes en curso (incompleto) se regenera en cada corrida.
+# ============================================================
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from engine import (  # noqa: E402
+    AppConfig,
+    build_pyramids,
+    compute_global_window,
+    data_hash,
+    file_version,
+    generate_pdf,
+    load_historian,
+    load_washes,
+    params_fingerprint,
+    process_coolers,
+)
+
+# Estado del pipeline en cada proceso de backfill (se carga una vez por worker)
+_STATE: Dict[str, Any] = {}
+
+
+def run_headless(data_file: str, wash_file: str, min_blower: float, min_flow: float) -> Dict[str, Any]:
+    """Pipeline completo del dashboard, sin Streamlit."""
+    cfg = AppConfig()
+    df_wide, ts_col = load_historian(data_file, cfg.CACHE_DIR, cfg.CACHE_MAX_MB)
+    if df_wide.empty:
+        raise SystemExit(f"No se pudo cargar: {data_file}")
+    washes = load_washes(wash_file)
+    all_df, all_op, _ = process_coolers(df_wide, washes, ts_col, min_blower, min_flow)
+    return {
+        "all_df": all_df, "washes": washes, "ts_col": ts_col,
+        "pyramids": build_pyramids(all_op, ts_col),
+        "data_version": data_hash(df_wide.attrs.get("data_version", ""), file_version(wash_file), min_blower,
+                                  min_flow, params_fingerprint(), ts_col),
+    }
+
+
+def write_report(state: Dict[str, Any], path: str, window_days: int, end: Optional[pd.Timestamp] = None,
+                 model_choice: str = "AUTO", logo_path: str = "", max_workers: Optional[int] = None) -> bool:
+    """Escribe un PDF (escritura atómica); False si no hay datos o falta reportlab/matplotlib."""
+    pdf = generate_pdf(state["all_df"], state["washes"], state["ts_col"], window_days, model_choice, logo_path,
+                       state["pyramids"], state["data_version"], max_workers=max_workers, end=end)
+    if not pdf:
+        return False
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+    return True
+
+
+def month_windows(all_df: Dict[str, pd.DataFrame], ts_col: str) -> List[Tuple[str, int, pd.Timestamp, bool]]:
+    """
+    ``(AAAA-MM, días, fin, completo)`` por cada mes con datos en algún
+    enfriador; ``completo`` es False para el mes en curso (el último dato
+    es anterior al fin del mes).
+    """
+    ts = pd.concat([df[ts_col] for df in all_df.values() if not df.empty], ignore_index=True).dropna()
+    if ts.empty:
+        return []
+    months = pd.period_range(ts.min().to_period("M"), ts.max().to_period("M"), freq="M")
+    last = ts.max()
+    return [(str(m), m.days_in_month, m.end_time, m.end_time <= last) for m in months]
+
+
+def _init_worker(state: Dict[str, Any]) -> None:
+    _STATE.update(state)
+
+
+def _backfill_month(month: str, window_days: int, end: pd.Timestamp, path: str, model_choice: str,
+                    logo_path: str) -> Tuple[str, bool, float]:
+    """Trabajo de un mes (proceso hijo): las figuras se dibujan en serie dentro del worker."""
+    t0 = time.perf_counter()
+    ok = write_report(_STATE, path, window_days, end, model_choice, logo_path, max_workers=1)
+    return month, ok, time.perf_counter() - t0
+
+
+def backfill(state: Dict[str, Any], out_dir: str, workers: Optional[int] = None, force: bool = False,
+             model_choice: str = "AUTO", logo_path: str = "") -> List[Tuple[str, bool, float]]:
+    """
+    Un reporte por mes de historia (``reporte_AAAA-MM.pdf``), en procesos
+    paralelos. Los meses completos ya archivados se omiten; el mes en curso
+    se regenera en cada corrida hasta que se complete.
+    """
+    tasks = []
+    for month, days, end, complete in month_windows(state["all_df"], state["ts_col"]):
+        path = os.path.join(out_dir, f"reporte_{month}.pdf")
+        if force or not complete or not os.path.exists(path):
+            tasks.append((month, days, end, path, model_choice, logo_path))
+    if not tasks:
+        return []
+
+    workers = workers if workers is not None else min(len(tasks), os.cpu_count() or 1)
+    if workers <= 1:
+        _init_worker(state)
+        return [_backfill_month(*t) for t in tasks]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker, initargs=(state,)) as pool:
+        futures = [pool.submit(_backfill_month, *t) for t in tasks]
+        for fut in as_completed(futures):
+            results.append(fut.result())
+            month, ok, seconds = results[-1]
+            print(f"  {month}: {'OK' if ok else 'sin datos'} ({seconds:.1f} s)", flush=True)
+    return sorted(results)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    warnings.filterwarnings("ignore")
+    cfg = AppConfig()
+    parser = argparse.ArgumentParser(description="Genera reportes PDF de los enfriadores CAP-3 sin abrir el dashboard.")
+    parser.add_argument("--data", default=cfg.DATA_FILE, help="Archivo historian (CSV ancho)")
+    parser.add_argument("--washes", default=cfg.WASH_FILE, help="Archivo de lavados")
+    parser.add_argument("--out", default="reportes", help="Carpeta de salida")
+    parser.add_argument("--window-days", type=int, default=None, help="Ventana en días (por defecto, la global)")
+    parser.add_argument("--start", default=None, help="Inicio del período (AAAA-MM-DD)")
+    parser.add_argument("--end", default=None, help="Fin del período (AAAA-MM-DD, inclusive)")
+    parser.add_argument("--backfill", action="store_true", help="Un reporte por mes de historia")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para --backfill (por defecto, CPUs)")
+    parser.add_argument("--force", action="store_true", help="Regenerar meses ya archivados")
+    parser.add_argument("--min-blower", type=float, default=50, help="Velocidad mín. soplador (%%)")
+    parser.add_argument("--min-flow", type=float, default=30, help="Flujo agua mín. (%% diseño)")
+    parser.add_argument("--model", default="AUTO")
+    parser.add_argument("--logo", default="")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    state = run_headless(args.data, args.washes, args.min_blower, args.min_flow)
+    print(f"Pipeline: {time.perf_counter() - t0:.1f} s")
+
+    if args.backfill:
+        t0 = time.perf_counter()
+        results = backfill(state, args.out, args.workers, args.force, args.model, args.logo)
+        written = sum(ok for _, ok, _ in results)
+        print(f"Backfill: {written}/{len(results)} reportes nuevos en {args.out} ({time.perf_counter() - t0:.1f} s)")
+        return 0
+
+    end = pd.Timestamp(args.end) + pd.Timedelta(days=1) - pd.Timedelta(1, "ns") if args.end else None
+    if args.start:
+        stop = end if end is not None else max(df[state["ts_col"]].max() for df in state["all_df"].values()
+                                               if not df.empty)
+        window_days = max(int(np.ceil((stop - pd.Timestamp(args.start)) / pd.Timedelta(days=1))), 1)
+    elif args.window_days:
+        window_days = args.window_days
+    else:
+        window_days = compute_global_window(state["all_df"], state["ts_col"], cfg.FALLBACK_WINDOW_DAYS)
+
+    stamp = f"{args.start or 'inicio'}_{args.end or 'ultimo'}" if args.start or args.end else f"{window_days}d"
+    path = os.path.join(args.out, f"reporte_{stamp}.pdf")
+    if not write_report(state, path, window_days, end, args.model, args.logo):
+        print("Sin datos para el período o faltan reportlab/matplotlib.")
+        return 1
+    print(f"Reporte: {path} ({window_days} días)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())